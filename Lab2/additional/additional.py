@@ -1,14 +1,30 @@
 import builtins
 import inspect
-from types import FunctionType, CodeType, LambdaType
+import mmap
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from importlib import import_module
+from types import FunctionType, CodeType, LambdaType, MethodType
+from additional.attr_plan import object_attrs, class_attrs
 
 primitives = (int, str, bool, float,)
+CODE_CACHE_SIZE = 1024
+# Top-level containers smaller than this aren't worth a process pool.
+PARALLEL_MIN = 1024
+code_objects = OrderedDict()
+code_lock = threading.Lock()
+# Compressor modules are imported when a compressed file is first opened.
+COMPRESSORS = {'.gz': ('gzip', 'compresslevel'), '.bz2': ('bz2', 'compresslevel'), '.xz': ('lzma', 'preset')}
 
 def is_iterable(obj):
     return getattr(obj, "__iter__", None) is not None
 
 
-def wis_function(obj):
+def is_function(obj):
     return inspect.isfunction(obj) or inspect.ismethod(obj) or isinstance(obj, LambdaType)
 
 
@@ -20,57 +36,393 @@ def get_global_vars(func):
     return globs
 
 
-def pack_iterable(obj):
-    if isinstance(obj, list) or isinstance(obj, tuple) or isinstance(obj, set):
-        packed_iterable = []
-        for value in obj:
-            if value is None:
-                packed_iterable.append(None)
-            packed_iterable.append(convert(value))
-        if isinstance(obj, tuple):
-            return tuple(packed_iterable)
-        if isinstance(obj, set):
-            return set(packed_iterable)
-        return packed_iterable
-    elif isinstance(obj, dict):
-        packed_dict = {}
-        for key, value in obj.items():
-            packed_dict[key] = convert(value)
-        return packed_dict
-
-
-def unpack_iterable(obj):
-    if isinstance(obj, list) or isinstance(obj, tuple) or isinstance(obj, set):
-        unpacked_iterable = []
-        for value in obj:
-            if value == None:
-                unpacked_iterable.append(None)
-            unpacked_iterable.append(deconvert(value))
-        if isinstance(obj, tuple):
-            return tuple(unpacked_iterable)
-        if isinstance(obj, set):
-            return set(unpacked_iterable)
-        return unpacked_iterable
-    elif isinstance(obj, dict):
-        unpacked_dict = {}
-        for key, value in obj.items():
-            unpacked_dict[key] = deconvert(value)
-        return unpacked_dict
-
-
-def pack_inner_func(obj):
-    return pack_function(FunctionType(obj, {}))
-
-
-def pack_function(obj):
-    result = {"__type__": "function"}
+def compression(fp):
+    suffix = os.path.splitext(fp)[1]
+    return suffix if suffix in COMPRESSORS else ''
+
+
+def open_file(fp, mode='r', level=None, buffering=-1):
+    # Files named like data.json.gz go through the matching stdlib
+    # compressor, which works on the stream block by block. level is the
+    # compression level (the preset for xz) and only matters for writing.
+    suffix = compression(fp)
+    if not suffix:
+        return open(fp, mode, buffering=buffering)
+    module, level_arg = COMPRESSORS[suffix]
+    mode = mode.replace('+', '')
+    if 'b' not in mode:
+        mode += 't'
+    kwargs = {level_arg: level} if level is not None and 'r' not in mode else {}
+    return import_module(module).open(fp, mode, **kwargs)
+
+
+@contextmanager
+def open_mapped(fp):
+    # A read-only mapping of the whole file. Pages are read in as the parser
+    # reaches them and the OS can drop them again, so nothing is copied up
+    # front. Empty files can't be mapped and come back as b''.
+    with open(fp, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+
+def mapped_lines(view):
+    # Decodes one line at a time, keeping its line break like a text file.
+    pos = 0
+    end = len(view)
+    while pos < end:
+        stop = view.find(b'\n', pos) + 1 or end
+        yield view[pos:stop].decode()
+        pos = stop
+
+
+def split_chunks(obj, workers, chunk_size=None):
+    # Splits a top-level list, tuple, set or dict into runs of items (key,
+    # value pairs for dicts). Returns None for anything else.
+    kind = type(obj)
+    if kind not in (list, tuple, set, dict) or len(obj) < PARALLEL_MIN:
+        return None
+    items = list(obj.items()) if kind is dict else list(obj)
+    if chunk_size is None:
+        chunk_size = -(-len(items) // (workers * 4))
+    return kind, [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def call_pickled(func, payload):
+    import pickle
+    return func(*pickle.loads(payload))
+
+
+def map_chunks(func, chunks, workers):
+    # Calls func(index, chunk) in a process pool and returns the results in
+    # chunk order. Chunks are pickled here just before they are sent, the
+    # pool hangs on 3.8 if its feeder thread fails to, and at most two per
+    # worker are in flight, so the parent never holds a pickled copy of the
+    # whole container. None means a chunk can't be sent to worker processes
+    # (e.g. local classes or lambdas).
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor
+    call = partial(call_pickled, func)
+    pending = []
+    results = []
+    with ProcessPoolExecutor(workers) as executor:
+        for index, chunk in enumerate(chunks):
+            if len(pending) >= 2 * workers:
+                results.append(pending.pop(0).result())
+            try:
+                payload = pickle.dumps((index, chunk), pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                for future in pending:
+                    future.cancel()
+                return None
+            pending.append(executor.submit(call, payload))
+        results.extend(future.result() for future in pending)
+    return results
+
+
+def dumps_parallel(obj, workers, encode, join):
+    # Each chunk of a big top-level container is packed and emitted in a
+    # process pool by encode(is_dict, chunk_memo, chunk), which has to be
+    # picklable; chunk_memo is the Memo the chunk is packed with.
+    # join(kind, texts) puts the document together. References are tracked
+    # per chunk: an object shared between chunks is written once in each
+    # of them and loads back as separate copies. Chunk k numbers its
+    # entities k, k + n, k + 2n... so ids never clash across chunks. None
+    # means the caller should encode serially.
+    split = split_chunks(obj, workers)
+    if split is None:
+        return None
+    kind, chunks = split
+    texts = map_chunks(partial(encode_in_chunk, encode, kind is dict, len(chunks)), chunks, workers)
+    if texts is None:
+        return None
+    return join(kind, texts)
+
+
+def encode_in_chunk(encode, is_dict, count, index, chunk):
+    return encode(is_dict, Memo(index, count), chunk)
+
+
+class Memo(dict):
+    # Entity ids are offset + n * stride for the n-th entity remembered.
+    def __init__(self, offset=0, stride=1):
+        super().__init__()
+        self.plans = {}
+        self.offset = offset
+        self.stride = stride
+
+
+def lookup_ref(obj, memo):
+    entry = memo.get(id(obj))
+    if entry is not None:
+        return {"__type__": "ref", "__id__": entry[0]}
+
+
+def remember(obj, memo):
+    # The memo keeps obj alive, so its id can't be reused by a temporary
+    # (e.g. a bound method) while the conversion is still running.
+    ref_id = memo.offset + len(memo) * memo.stride
+    memo[id(obj)] = (ref_id, obj)
+    return ref_id
+
+
+SEQ, MAP, ATTR = range(3)
+OBJECT_META = ('__type__', '__id__', '__class__')
+CLASS_META = ('__type__', '__id__', '__name__')
+LEAVES = frozenset((int, str, bool, float, type(None)))
+
+
+def walk(obj, memo, node):
+    # node(value, memo) returns (result, None) for leaves and (result, frame)
+    # for containers, where frame is (kind, items, out, build): items yields
+    # the children still to visit, out collects them and build, if set, turns
+    # out into the final value. Children are visited depth first with an
+    # explicit stack, so nesting depth is limited by memory rather than the
+    # recursion limit. Exact primitives are the same on both sides and skip
+    # the node call. Plain containers aren't memoized, so the ids of the
+    # ones still open catch a container that holds itself.
+    result, frame = node(obj, memo)
+    if frame is None:
+        return result
+    leaves = LEAVES
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    key = None
+    source = obj
+    opened = {id(obj)}
+    while True:
+        kind, items, out, build = frame
+        child = None
+        if kind == SEQ:
+            append = out.append
+            for item in items:
+                if item.__class__ in leaves:
+                    append(item)
+                    continue
+                value, child = node(item, memo)
+                if child is not None:
+                    break
+                append(value)
+            child_key = None
+        elif kind == MAP:
+            for child_key, item in items:
+                if item.__class__ in leaves:
+                    out[child_key] = item
+                    continue
+                value, child = node(item, memo)
+                if child is not None:
+                    break
+                out[child_key] = value
+        else:
+            for child_key, item in items:
+                if item.__class__ in leaves:
+                    setattr(out, child_key, item)
+                    continue
+                value, child = node(item, memo)
+                if child is not None:
+                    break
+                setattr(out, child_key, value)
+        if child is not None:
+            if id(item) in opened:
+                raise ValueError("circular reference")
+            opened.add(id(item))
+            push((frame, result, key, source))
+            frame, result, key, source = child, value, child_key, item
+            continue
+        value = result if build is None else build(out)
+        if not stack:
+            return value
+        opened.discard(id(source))
+        child_key = key
+        frame, result, key, source = pop()
+        kind, _, out, _ = frame
+        if kind == SEQ:
+            out.append(value)
+        elif kind == MAP:
+            out[child_key] = value
+        else:
+            setattr(out, child_key, value)
+
+
+def pack_leaf(obj, memo):
+    return obj, None
+
+
+def pack_skip(obj, memo):
+    return None, None
+
+
+def pack_plain_dict(obj, memo):
+    out = {}
+    return out, (MAP, iter(obj.items()), out, None)
+
+
+def pack_dict(obj, memo):
+    # A dict with its own "__type__" key would be read back as a packed
+    # entity, so it goes inside a "dict" entity instead.
+    if "__type__" in obj:
+        out = {}
+        return {"__type__": "dict", "__value__": out}, (MAP, iter(obj.items()), out, None)
+    return pack_plain_dict(obj, memo)
+
+
+def pack_list(obj, memo):
+    out = []
+    return out, (SEQ, iter(obj), out, None)
+
+
+def pack_tuple(obj, memo):
+    out = []
+    return out, (SEQ, iter(obj), out, tuple)
+
+
+def pack_set(obj, memo):
+    out = []
+    return out, (SEQ, iter(obj), out, set)
+
+
+def pack_inner_func(obj, memo=None):
+    return convert(FunctionType(obj, {})), None
+
+
+def pack_function(obj, memo):
     if inspect.ismethod(obj):
         obj = obj.__func__
-    result["__name__"] = obj.__name__
-    globs = get_global_vars(obj)
-    result["__globals__"] = pack_iterable(globs)
+    ref = lookup_ref(obj, memo)
+    if ref is not None:
+        return ref, None
+    globs = {}
+    code = obj.__code__
+    result = {"__type__": "function", "__id__": remember(obj, memo), "__name__": obj.__name__,
+              "__globals__": globs, "__args__": pack_code(code, code.co_filename, code.co_lnotab)}
+    return result, (MAP, iter(get_global_vars(obj).items()), globs, None)
+
+
+def class_items(obj, plans):
+    for attr in class_attrs(obj, plans):
+        value = getattr(obj, attr)
+        if attr != "__init__" or is_function(value):
+            yield attr, value
+
+
+def pack_class(obj, memo):
+    ref = lookup_ref(obj, memo)
+    if ref is not None:
+        return ref, None
+    result = {'__type__': 'class', '__id__': remember(obj, memo), '__name__': obj.__name__}
+    return result, (MAP, class_items(obj, memo.plans), result, None)
+
+
+def pack_object(obj, memo):
+    ref = lookup_ref(obj, memo)
+    if ref is not None:
+        return ref, None
+    result = {"__type__": "object", "__id__": remember(obj, memo),
+              "__class__": obj.__class__.__name__}
+    return result, (MAP, iter(object_attrs(obj, memo.plans)), result, None)
+
+
+PACKERS = {int: pack_leaf, str: pack_leaf, bool: pack_leaf, float: pack_leaf, type(None): pack_leaf,
+           dict: pack_dict, list: pack_list, tuple: pack_tuple, set: pack_set,
+           FunctionType: pack_function, MethodType: pack_function, CodeType: pack_inner_func,
+           type: pack_class}
+# Checked in order for types missing from PACKERS, i.e. subclasses.
+PACKER_BASES = ((primitives, pack_leaf), (dict, pack_dict), (tuple, pack_tuple), (set, pack_set),
+                (list, pack_list), (type, pack_class))
+subclass_packers = weakref.WeakKeyDictionary()
+
+
+def resolve_packer(cls):
+    for base, packer in PACKER_BASES:
+        if issubclass(cls, base):
+            return packer
+    return pack_skip if is_iterable(cls) else pack_object
+
+
+def pack_node(obj, memo):
+    packer = PACKERS.get(type(obj))
+    if packer is None:
+        cls = type(obj)
+        packer = subclass_packers.get(cls)
+        if packer is None:
+            packer = subclass_packers[cls] = resolve_packer(cls)
+    return packer(obj, memo)
+
+
+def unpack_function(src, memo):
+    coded = unpack_code(src["__args__"])
+    globs = {"__builtins__": builtins}
+    result = FunctionType(coded, globs)
+    if "__id__" in src:
+        memo[src["__id__"]] = result
+    items = ((key, value) for key, value in src["__globals__"].items() if key in coded.co_names)
+    return result, (MAP, items, globs, None)
+
+
+def unpack_object(src, memo):
+    meta = type(src.get("__class__"), (), {})
+    result = meta()
+    if "__id__" in src:
+        memo[src["__id__"]] = result
+    items = ((key, value) for key, value in src.items() if key not in OBJECT_META)
+    return result, (ATTR, items, result, None)
+
+
+def unpack_class(src, memo):
+    result = type(src["__name__"], (), {})
+    if "__id__" in src:
+        memo[src["__id__"]] = result
+    items = ((key, value) for key, value in src.items() if key not in CLASS_META)
+    return result, (ATTR, items, result, None)
+
+
+def unpack_ref(src, memo):
+    return memo[src["__id__"]], None
+
+
+def unpack_escaped(src, memo):
+    return pack_plain_dict(src["__value__"], memo)
+
+
+TAGGED = {"ref": unpack_ref, "function": unpack_function, "object": unpack_object, "class": unpack_class,
+          "dict": unpack_escaped}
+
+
+def unpack_dict(src, memo):
+    tag = src.get("__type__")
+    if tag.__class__ is str and tag in TAGGED:
+        return TAGGED[tag](src, memo)
+    return pack_plain_dict(src, memo)
+
+
+UNPACKERS = {int: pack_leaf, str: pack_leaf, bool: pack_leaf, float: pack_leaf, type(None): pack_leaf,
+             dict: unpack_dict, list: pack_list, tuple: pack_tuple, set: pack_set}
+UNPACKER_BASES = ((primitives, pack_leaf), (dict, unpack_dict), (tuple, pack_tuple), (set, pack_set),
+                  (list, pack_list))
+
+
+def unpack_node(src, memo):
+    unpacker = UNPACKERS.get(type(src))
+    if unpacker is None:
+        unpacker = pack_skip
+        for base, handler in UNPACKER_BASES:
+            if isinstance(src, base):
+                unpacker = handler
+                break
+    return unpacker(src, memo)
+
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def pack_code(code, filename, lnotab):
+    # Code objects compare by content but ignore co_filename and co_lnotab,
+    # so those two are part of the cache key as well. The packed dict is
+    # shared between callers and must not be mutated.
     arguments = {}
-    for (key, value) in inspect.getmembers(obj.__code__):
+    for (key, value) in inspect.getmembers(code):
         if key.startswith("co_"):
             if isinstance(value, bytes):
                 value = list(value)
@@ -84,37 +436,46 @@ def pack_function(obj):
                 arguments[key] = converted_vals
                 continue
             arguments[key] = value
-    result["__args__"] = arguments
-    return result
+    return arguments
+
+
+def freeze(value):
+    if isinstance(value, (list, tuple)):
+        return (type(value),) + tuple(freeze(val) for val in value)
+    if isinstance(value, dict):
+        return tuple((key, freeze(val)) for key, val in value.items())
+    if isinstance(value, set):
+        return frozenset(freeze(val) for val in value)
+    return (type(value), value)
 
 
-def unpack_function(src):
-    arguments = src["__args__"]
-    globs = src["__globals__"]
-    globs["__builtins__"] = builtins
-    for key in src["__globals__"]:
-        if key in arguments["co_names"]:
-            globs[key] = deconvert(src["__globals__"][key])
+def code_key(arguments):
+    values = []
+    for name, value in arguments.items():
+        if name == 'co_consts':
+            value = freeze(value)
+        elif name in ('co_code', 'co_lnotab'):
+            value = bytes(value)
+        elif isinstance(value, (list, tuple)):
+            value = tuple(value)
+        values.append(value)
+    return tuple(arguments), tuple(values)
 
-    temp_consts = []
-    for val in list(arguments["co_consts"]):
+
+def unpack_code(arguments):
+    key = code_key(arguments)
+    # The lock only guards the LRU bookkeeping; building the code object
+    # converts its constants, which can land here again.
+    with code_lock:
+        coded = code_objects.get(key)
+        if coded is not None:
+            code_objects.move_to_end(key)
+            return coded
+
+    consts = []
+    for val in arguments["co_consts"]:
         func = deconvert(val)
-        if is_function(func):
-            val = deconvert(val)
-            temp_consts.append(val.__code__)
-            continue
-        temp_consts.append(val)
-    arguments["co_consts"] = temp_consts
-
-    for val in arguments:
-        if is_iterable(arguments[val]) and not isinstance(arguments[val], str):
-            temp_ls = []
-            for value in arguments[val]:
-                if value == None:
-                    temp_ls.append(None)
-                else:
-                    temp_ls.append(value)
-            arguments[val] = temp_ls
+        consts.append(func.__code__ if is_function(func) else val)
 
     coded = CodeType(arguments['co_argcount'],
                      arguments['co_posonlyargcount'],
@@ -123,7 +484,7 @@ def unpack_function(src):
                      arguments['co_stacksize'],
                      arguments['co_flags'],
                      bytes(arguments['co_code']),
-                     tuple(arguments['co_consts']),
+                     tuple(consts),
                      tuple(arguments['co_names']),
                      tuple(arguments['co_varnames']),
                      arguments['co_filename'],
@@ -132,73 +493,97 @@ def unpack_function(src):
                      bytes(arguments['co_lnotab']),
                      tuple(arguments['co_freevars']),
                      tuple(arguments['co_cellvars']))
-    return FunctionType(coded, globs)
+    with code_lock:
+        code_objects[key] = coded
+        if len(code_objects) > CODE_CACHE_SIZE:
+            code_objects.popitem(last=False)
+    return coded
 
 
-def pack_object(obj):
-    result = {"__type__": "object", "__class__": obj.__class__.__name__}
-    for attr in dir(obj):
-        if not attr.startswith("__"):
-            value = convert(getattr(obj, attr))
-            result[attr] = value
-    return result
+def clear_code_cache():
+    pack_code.cache_clear()
+    with code_lock:
+        code_objects.clear()
 
 
-def unpack_object(src):
-    meta = type(src.get("__class__"), (), {})
-    result = meta()
-    for key, value in src.items():
-        if key == '__class__':
+def convert(obj, memo=None, node=pack_node):
+    if memo is None:
+        memo = Memo()
+    return walk(obj, memo, node)
+
+
+def deconvert(src, memo=None, node=unpack_node):
+    if memo is None:
+        memo = {}
+    return walk(src, memo, node)
+
+
+SEQUENCES = frozenset((list, tuple, set))
+# Scalar spellings shared by the text formats.
+LITERALS = {'null': None, 'true': True, 'false': False}
+# Pushed after a container's id and popped once all its children are done.
+CLOSE = object()
+
+
+def check_data(obj, leaves=LEAVES):
+    # Plain data needs no packing: one pass makes sure nothing in the tree
+    # would, and the tree itself goes to the emitter unchanged. Containers
+    # may be shared, but one that holds itself can't be written out.
+    pending = [obj]
+    pop = pending.pop
+    push = pending.append
+    extend = pending.extend
+    opened = set()
+    while pending:
+        value = pop()
+        cls = value.__class__
+        if cls in leaves:
             continue
-        setattr(result, key, deconvert(value))
-    return result
-
-
-def pack_class(obj):
-    result = {'__type__': 'class', '__name__': obj.__name__}
-    for attr in dir(obj):
-        if attr == "__init__":
-            attr_value = getattr(obj, attr)
-            result[attr] = pack_function(attr_value)
-        if not attr.startswith('__'):
-            attr_value = getattr(obj, attr)
-            result[attr] = convert(attr_value)
-    return result
-
-
-def unpack_class(src):
-    vars = {}
-    for attr, value in src.items():
-        vars[attr] = deconvert(value)
-    return type(src["__name__"], (), vars)
-
-def convert(obj):
-    if isinstance(obj, primitives):
-        return obj
-    elif obj is None:
-        return None
-    elif is_function(obj):
-        return pack_function(obj)
-    elif inspect.iscode(obj):
-        return pack_inner_func(obj)
-    elif inspect.isclass(obj):
-        return pack_class(obj)
-    elif is_iterable(obj):
-        return pack_iterable(obj)
-    else:
-        return pack_object(obj)
-
-def deconvert(src):
-    if isinstance(src, primitives):
-        return src
-    elif isinstance(src, dict):
-        if "function" in src.values():
-            return unpack_function(src)
-        elif "object" in src.values():
-            return unpack_object(src)
-        elif "class" in src.values():
-            return unpack_class(src)
+        if value is CLOSE:
+            opened.discard(pop())
+            continue
+        if cls is dict:
+            for key in value:
+                if key.__class__ not in leaves:
+                    raise TypeError(f"{key.__class__.__name__} key is not plain data")
+            children = value.values()
+        elif cls in SEQUENCES:
+            children = value
         else:
-            return unpack_iterable(src)
-    elif is_iterable(src):
-        return unpack_iterable(src)
\ No newline at end of file
+            raise TypeError(f"{cls.__name__} is not plain data")
+        ident = id(value)
+        if ident in opened:
+            raise ValueError("circular reference")
+        opened.add(ident)
+        push(ident)
+        push(CLOSE)
+        extend(children)
+    return obj
+
+
+def from_collection(items):
+    # Text formats write a sequence as ['__tuple__', *items] and the like.
+    if not items:
+        return items
+    s_type = items[0]
+    del items[0]
+    if s_type == '__tuple__':
+        return tuple(items)
+    elif s_type == '__set__':
+        return set(items)
+    return items
+
+
+class Packing:
+    def __init__(self, data_only=False):
+        self.data_only = data_only
+
+    def pack(self, obj, memo=None):
+        if self.data_only:
+            return check_data(obj)
+        return convert(obj, memo)
+
+    def unpack(self, src, memo=None):
+        if self.data_only:
+            return src
+        return deconvert(src, memo)
@@ -0,0 +1,108 @@
+import weakref
+from types import FunctionType, MemberDescriptorType
+
+INSTANCE, METHOD, CLASS, SLOT, DATA, DESCRIPTOR = range(6)
+MISSING = object()
+
+plans = weakref.WeakKeyDictionary()
+
+
+class ClassPlan:
+    def __init__(self, cls, signature):
+        self.signature = signature
+        self.names = [name for name in dir(cls) if not name.startswith('__') or name == '__init__']
+        self.kinds = {name: kind_of(lookup_static(cls, name)) for name in self.names}
+        self.generic = (type.__getattribute__(cls, '__getattribute__') is not object.__getattribute__
+                        or type.__getattribute__(cls, '__dir__') is not object.__dir__)
+        self.layouts = {}
+
+    def layout(self, keys):
+        # Instance attributes only shadow plain class values and non-data
+        # descriptors, the same precedence getattr() applies.
+        plan = self.layouts.get(keys)
+        if plan is None:
+            plan = []
+            names = set(name for name in self.names if not name.startswith('__'))
+            names.update(key for key in keys if not key.startswith('__'))
+            for name in sorted(names):
+                kind = self.kinds.get(name)
+                if name in keys and kind not in (SLOT, DATA):
+                    kind = INSTANCE
+                plan.append((name, kind))
+            self.layouts[keys] = plan
+        return plan
+
+
+def lookup_static(cls, name):
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return vars(klass)[name]
+    return MISSING
+
+
+def kind_of(value):
+    if value is MISSING:
+        return DESCRIPTOR
+    if isinstance(value, FunctionType):
+        return METHOD
+    if isinstance(value, MemberDescriptorType):
+        return SLOT
+    if hasattr(type(value), '__set__') or hasattr(type(value), '__delete__'):
+        return DATA
+    if hasattr(type(value), '__get__'):
+        return DESCRIPTOR
+    return CLASS
+
+
+def class_signature(cls):
+    # Only ids and attribute kinds, so the cache never keeps a class alive.
+    return tuple((id(klass), tuple((name, kind_of(value)) for name, value in vars(klass).items()))
+                 for klass in cls.__mro__)
+
+
+def get_plan(cls, seen):
+    # seen maps classes to plans already validated during this conversion,
+    # so one convert() call over a million instances pays the introspection
+    # cost once.
+    plan = seen.get(cls)
+    if plan is None:
+        plan = plans.get(cls)
+        signature = class_signature(cls)
+        if plan is None or plan.signature != signature:
+            plan = ClassPlan(cls, signature)
+            plans[cls] = plan
+        seen[cls] = plan
+    return plan
+
+
+def invalidate(cls=None):
+    if cls is None:
+        plans.clear()
+    else:
+        plans.pop(cls, None)
+
+
+def object_attrs(obj, seen):
+    cls = type(obj)
+    plan = get_plan(cls, seen)
+    if plan.generic:
+        return [(attr, getattr(obj, attr)) for attr in dir(obj) if not attr.startswith('__')]
+    inst = getattr(obj, '__dict__', {})
+    attrs = []
+    for name, kind in plan.layout(tuple(inst)):
+        if kind == INSTANCE:
+            attrs.append((name, inst[name]))
+        elif kind == METHOD or kind == CLASS:
+            attrs.append((name, getattr(cls, name)))
+        elif kind == SLOT:
+            try:
+                attrs.append((name, getattr(obj, name)))
+            except AttributeError:
+                continue
+        else:
+            attrs.append((name, getattr(obj, name)))
+    return attrs
+
+
+def class_attrs(cls, seen):
+    return get_plan(cls, seen).names
@@ -0,0 +1,34 @@
+import argparse
+from factory.factory import Factory
+from benchmarks.common import best_time, make_records
+
+
+def make_payload(count):
+    # A dict of records, since Toml and Yaml can't hold dicts inside lists.
+    return {f'record{i}': record for i, record in enumerate(make_records(count))}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=50000, help="Records in the payload")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per format, best is reported")
+    parser.add_argument("-f", "--formats", nargs="+", default=[".json", ".toml", ".yaml"],
+                        help="Text formats to compare against")
+    args = parser.parse_args()
+
+    payload = make_payload(args.count)
+    binary = Factory.create_serializer('.bin')
+    bin_dumps, data = best_time(binary.dumps, payload, args.repeat)
+    bin_loads, _ = best_time(binary.loads, data, args.repeat)
+    print(f"{'.bin':<7}{len(data):>12,} B  dumps {bin_dumps:.2f} s  loads {bin_loads:.2f} s")
+    for fmt in args.formats:
+        serializer = Factory.create_serializer(fmt)
+        dumps, text = best_time(serializer.dumps, payload, args.repeat)
+        loads, _ = best_time(serializer.loads, text, args.repeat)
+        size = len(text.encode()) if isinstance(text, str) else len(text)
+        print(f"{fmt:<7}{size:>12,} B  dumps {dumps:.2f} s  loads {loads:.2f} s"
+              f"  (.bin is {size / len(data):.1f}x smaller, {dumps / bin_dumps:.1f}x/{loads / bin_loads:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+import time
+
+RECORD = {'id': 0, 'name': 'record name', 'score': 12.75, 'active': True,
+          'parent': None, 'tags': ['alpha', 'beta', 'gamma'], 'point': (3, -4)}
+
+
+def make_records(count):
+    return [dict(RECORD, id=i) for i in range(count)]
+
+
+def best_time(func, arg, repeat, setup=None):
+    # setup runs before every run and isn't timed. Returns the best time
+    # and the last result.
+    best = None
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
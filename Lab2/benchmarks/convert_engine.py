@@ -0,0 +1,61 @@
+import argparse
+import sys
+from additional.additional import convert, deconvert
+from benchmarks.common import best_time, make_records
+from benchmarks.reference import recursive_convert, recursive_deconvert
+
+
+def make_nested(depth):
+    root = node = []
+    for _ in range(depth - 1):
+        child = []
+        node.append({'level': child})
+        node = child
+    return root
+
+
+def max_depth(engine, limit):
+    # Doubles the nesting until the engine fails, then bisects. A result
+    # equal to the limit means the engine never failed.
+    low, high = 0, 1
+    while True:
+        try:
+            engine(make_nested(min(high, limit)))
+        except RecursionError:
+            break
+        if high >= limit:
+            return limit
+        low, high = high, high * 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        try:
+            engine(make_nested(middle))
+            low = middle
+        except RecursionError:
+            high = middle
+    return low
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=100000, help="Records in the throughput payload")
+    parser.add_argument("-d", "--depth-limit", type=int, default=1 << 20, help="Deepest nesting to try")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per engine, best is reported")
+    args = parser.parse_args()
+
+    print(f"recursion limit: {sys.getrecursionlimit()}")
+    print(f"max depth:       recursive {max_depth(recursive_convert, args.depth_limit)}"
+          f"  iterative {max_depth(convert, args.depth_limit)}")
+
+    payload = make_records(args.count)
+    packed = convert(payload)
+    for name, new, old, obj in (("convert", convert, recursive_convert, payload),
+                                ("deconvert", deconvert, recursive_deconvert, packed)):
+        new_time, _ = best_time(new, obj, args.repeat)
+        old_time, _ = best_time(old, obj, args.repeat)
+        print(f"{name + ':':<17}recursive {args.count / old_time:,.0f} rec/s"
+              f"  iterative {args.count / new_time:,.0f} rec/s  ({old_time / new_time:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import argparse
+from my_json_serializer.json_serializer import Json
+from benchmarks.common import best_time, make_records
+from benchmarks.reference import LegacyJsonParser
+
+
+def make_document(size_mb):
+    chunk = Json().to_str(make_records(1000))
+    copies = max(1, int(size_mb * 2 ** 20 / len(chunk)))
+    return '["__list__", ' + ', '.join([chunk] * copies) + ']'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--size", type=float, default=100, help="Document size in MB")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Runs per parser, best is reported")
+    parser.add_argument("--no-legacy", action="store_true", help="Skip the old character scanner")
+    args = parser.parse_args()
+
+    s = make_document(args.size)
+    mb = len(s) / 2 ** 20
+    new, _ = best_time(Json().from_str, s, args.repeat)
+    print(f"document:  {mb:.1f} MB")
+    print(f"table:     {new:.2f} s  {mb / new:.1f} MB/s")
+    if not args.no_legacy:
+        old, _ = best_time(LegacyJsonParser().parse, s, args.repeat)
+        print(f"legacy:    {old:.2f} s  {mb / old:.1f} MB/s")
+        print(f"speedup:   {old / new:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
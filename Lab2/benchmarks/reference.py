@@ -0,0 +1,409 @@
+import builtins
+import inspect
+from types import FunctionType
+from additional.additional import (Memo, primitives, is_function, is_iterable, get_global_vars,
+                                   lookup_ref, remember, pack_code, unpack_code)
+from additional.attr_plan import object_attrs, class_attrs
+
+# Frozen copies of replaced implementations, kept only so the benchmarks
+# can measure the new code against what it replaced.
+
+
+class LegacyJsonParser:
+    def __init__(self):
+        self.pos = 0
+        self.nums = [str(i) for i in range(10)]
+
+    def parse(self, s):
+        self.pos = 0
+        return self.from_str(s)
+
+    def from_str(self, s):
+        if self.pos >= len(s):
+            return
+        if s[self.pos] in self.nums:
+            return self.from_str_num(s)
+        elif s[self.pos:self.pos+4] == 'null':
+            return self.from_str_null(s)
+        elif s[self.pos:self.pos+4] == 'true':
+            return self.from_str_true(s)
+        elif s[self.pos:self.pos+5] == 'false':
+            return self.from_str_false(s)
+        if s[self.pos] == '"':
+            return self.from_str_str(s)
+        if s[self.pos] == '[':
+            return self.from_str_collection(s)
+        if s[self.pos] == '{':
+            return self.from_str_dict(s)
+
+    def from_str_str(self, s):
+        res = ""
+        self.pos += 1
+        if s[self.pos] == '"':
+            self.pos += 1
+        while self.pos < len(s) and s[self.pos] not in ('"', "'"):
+            res += s[self.pos]
+            self.pos += 1        
+        self.pos += 1
+        return res
+
+    def from_str_num(self, s):
+        s_pos = self.pos
+        while self.pos < len(s) and (s[self.pos] in self.nums or s[self.pos] == '.'):
+            self.pos += 1
+        num = s[s_pos:self.pos]
+
+        return float(num) if '.' in str(num) else int(num)
+    
+    def from_str_null(self, s):
+        self.pos += 4
+        return None
+    
+    def from_str_true(self, s):
+        self.pos += 4
+        return True
+    
+    def from_str_false(self, s):
+        self.pos += 5
+        return False
+
+    def from_str_collection(self, s):
+        res = []
+        self.pos += 1
+        s_type = self.from_str_str(s)
+        while self.pos < len(s) and s[self.pos] not in (']', '}', ')'):
+            if s[self.pos] == ' ' or s[self.pos] == ',':
+                self.pos += 1
+                continue
+            v = self.from_str(s)
+            res.append(v)
+            if self.pos < len(s) and s[self.pos] in (']', '}', ')'):
+                break
+            self.pos += 1
+        self.pos += 1
+        if s_type == '__tuple__':
+            return tuple(res)
+        elif s_type == '__set__':
+            return set(res)
+        return res
+
+    def from_str_dict(self, s):
+        res = {}
+        self.pos += 1
+        while self.pos < len(s) and s[self.pos] != '}':
+            while s[self.pos] in (' ', ','):
+                self.pos += 1
+                continue            
+            k = self.from_str_str(s)
+            self.pos = s.find(':', self.pos)+2
+            v = self.from_str(s)
+            res[k] = v
+        self.pos += 1
+        return res
+
+
+class LegacyTomlParser:
+    def __init__(self):
+        self.pos = 0
+        self.nums = [str(i) for i in range(10)]
+        self.depth = 0
+
+    def parse(self, s):
+        self.pos = 0
+        self.depth = 0
+        return self.from_str(s, {})
+
+    def from_str(self, s, curr_dict={}):
+        if self.pos >= len(s):
+            return
+        elif s[self.pos] in self.nums:
+            return self.from_str_num(s)
+        elif s[self.pos:self.pos+4] == 'null':
+            return self.from_str_null(s)
+        elif s[self.pos:self.pos+4] == 'true':
+            return self.from_str_true(s)
+        elif s[self.pos:self.pos+5] == 'false':
+            return self.from_str_false(s)
+        elif s[self.pos] == '[':
+            return self.from_str_collection(s)
+        elif s[self.pos] == ']' or s[self.pos] =='.':
+            return self.from_str_dict(s, curr_dict)
+        elif self.pos == 0:
+            return self.from_str_dict(s, curr_dict)
+        else:
+            return self.from_str_str(s)
+
+    def from_str_str(self, s):
+        res = ""
+        opened = False
+        while self.pos < len(s) and s[self.pos] not in ('\n', ',', ' ') or opened:
+            if s[self.pos] == '"':
+                if opened:
+                    opened = False
+                else:
+                    opened = True
+                self.pos += 1
+                continue
+            res += s[self.pos]
+            self.pos += 1        
+        self.pos += 1
+        return res
+
+    def from_str_num(self, s):
+        s_pos = self.pos
+        while self.pos < len(s) and (s[self.pos] in self.nums or s[self.pos] == '.'):
+            self.pos += 1
+        num = s[s_pos:self.pos]
+        self.pos += 1
+        return float(num) if '.' in str(num) else int(num)
+    
+    def from_str_null(self, s):
+        self.pos += 5
+        return None
+    
+    def from_str_true(self, s):
+        self.pos += 5
+        return True
+    
+    def from_str_false(self, s):
+        self.pos += 6
+        return False
+
+    def from_str_collection(self, s):
+        res = []
+        self.pos += 2
+        s_type = self.from_str_str(s)
+        self.pos += 1
+        while self.pos < len(s) and s[self.pos] != ']':
+            self.pos += 1
+            v = self.from_str(s)
+            res.append(v)
+        self.pos += 2
+        if s_type == '__tuple__':
+            return tuple(res)
+        elif s_type == '__set__':
+            return set(res)
+        return res
+
+    def from_str_dictname(self, s):
+        res = ""
+        while self.pos < len(s) and s[self.pos] not in (']', '.'):
+            res += s[self.pos]
+            self.pos += 1    
+        return res
+
+    def from_str_dict(self, s, curr_dict):
+        res = {}
+        if curr_dict != {}:
+            res = curr_dict        
+        if s[self.pos] == ']':
+            self.pos += 2        
+        if s[self.pos] == '\n':
+            self.depth -= 1
+            return res
+        if s[self.pos] == '.':
+            self.pos += 1
+            k = self.from_str_dictname(s)
+            v = res.get(k)
+            self.depth += 1
+            if v is None:
+                v = self.from_str(s)
+            else:
+                v = self.from_str_dict(s, v)
+            res[k] = v
+        while self.pos < len(s):   
+            if s[self.pos] == '\n':
+                if self.depth != 0:
+                    self.depth -= 1
+                    return res
+                self.pos += 1
+                if self.pos >= len(s):
+                    return res
+                if s[self.pos] == '[':
+                    self.pos += 1
+                    k = self.from_str_dictname(s)
+                    v = res.get(k)
+                    self.depth += 1
+                    if v is None:
+                        v = self.from_str(s)
+                    else:
+                        v = self.from_str_dict(s, v)
+                else: 
+                    continue
+            else:    
+                k = self.from_str_str(s)  
+                if self.pos >= len(s):
+                    return k
+                self.pos += 2
+                v = self.from_str(s) 
+            res[k] = v
+        return res
+
+
+def recursive_pack_iterable(obj, memo=None):
+    if memo is None:
+        memo = Memo()
+    if isinstance(obj, list) or isinstance(obj, tuple) or isinstance(obj, set):
+        packed_iterable = []
+        for value in obj:
+            packed_iterable.append(recursive_convert(value, memo))
+        if isinstance(obj, tuple):
+            return tuple(packed_iterable)
+        if isinstance(obj, set):
+            return set(packed_iterable)
+        return packed_iterable
+    elif isinstance(obj, dict):
+        packed_dict = {}
+        for key, value in obj.items():
+            packed_dict[key] = recursive_convert(value, memo)
+        return packed_dict
+
+
+def recursive_unpack_iterable(obj, memo=None):
+    if memo is None:
+        memo = {}
+    if isinstance(obj, list) or isinstance(obj, tuple) or isinstance(obj, set):
+        unpacked_iterable = []
+        for value in obj:
+            unpacked_iterable.append(recursive_deconvert(value, memo))
+        if isinstance(obj, tuple):
+            return tuple(unpacked_iterable)
+        if isinstance(obj, set):
+            return set(unpacked_iterable)
+        return unpacked_iterable
+    elif isinstance(obj, dict):
+        unpacked_dict = {}
+        for key, value in obj.items():
+            unpacked_dict[key] = recursive_deconvert(value, memo)
+        return unpacked_dict
+
+
+def recursive_pack_inner_func(obj):
+    return recursive_pack_function(FunctionType(obj, {}))
+
+
+def recursive_pack_function(obj, memo=None):
+    if memo is None:
+        memo = Memo()
+    if inspect.ismethod(obj):
+        obj = obj.__func__
+    ref = lookup_ref(obj, memo)
+    if ref is not None:
+        return ref
+    result = {"__type__": "function", "__id__": remember(obj, memo)}
+    result["__name__"] = obj.__name__
+    globs = get_global_vars(obj)
+    result["__globals__"] = recursive_pack_iterable(globs, memo)
+    code = obj.__code__
+    result["__args__"] = pack_code(code, code.co_filename, code.co_lnotab)
+    return result
+
+
+def recursive_unpack_function(src, memo=None):
+    if memo is None:
+        memo = {}
+    arguments = src["__args__"]
+    coded = unpack_code(arguments)
+    globs = {"__builtins__": builtins}
+    result = FunctionType(coded, globs)
+    if "__id__" in src:
+        memo[src["__id__"]] = result
+    for key, value in src["__globals__"].items():
+        if key in coded.co_names:
+            globs[key] = recursive_deconvert(value, memo)
+    return result
+
+
+def recursive_pack_object(obj, memo=None):
+    if memo is None:
+        memo = Memo()
+    ref = lookup_ref(obj, memo)
+    if ref is not None:
+        return ref
+    result = {"__type__": "object", "__id__": remember(obj, memo),
+              "__class__": obj.__class__.__name__}
+    for attr, value in object_attrs(obj, memo.plans):
+        result[attr] = recursive_convert(value, memo)
+    return result
+
+
+def recursive_unpack_object(src, memo=None):
+    if memo is None:
+        memo = {}
+    meta = type(src.get("__class__"), (), {})
+    result = meta()
+    if "__id__" in src:
+        memo[src["__id__"]] = result
+    for key, value in src.items():
+        if key in ('__type__', '__id__', '__class__'):
+            continue
+        setattr(result, key, recursive_deconvert(value, memo))
+    return result
+
+
+def recursive_pack_class(obj, memo=None):
+    if memo is None:
+        memo = Memo()
+    ref = lookup_ref(obj, memo)
+    if ref is not None:
+        return ref
+    result = {'__type__': 'class', '__id__': remember(obj, memo), '__name__': obj.__name__}
+    for attr in class_attrs(obj, memo.plans):
+        attr_value = getattr(obj, attr)
+        if attr == "__init__":
+            result[attr] = recursive_pack_function(attr_value, memo)
+        else:
+            result[attr] = recursive_convert(attr_value, memo)
+    return result
+
+
+def recursive_unpack_class(src, memo=None):
+    if memo is None:
+        memo = {}
+    result = type(src["__name__"], (), {})
+    if "__id__" in src:
+        memo[src["__id__"]] = result
+    for attr, value in src.items():
+        if attr in ('__type__', '__id__', '__name__'):
+            continue
+        setattr(result, attr, recursive_deconvert(value, memo))
+    return result
+
+
+def recursive_convert(obj, memo=None):
+    if memo is None:
+        memo = Memo()
+    if isinstance(obj, primitives):
+        return obj
+    elif obj is None:
+        return None
+    elif is_function(obj):
+        return recursive_pack_function(obj, memo)
+    elif inspect.iscode(obj):
+        return recursive_pack_inner_func(obj)
+    elif inspect.isclass(obj):
+        return recursive_pack_class(obj, memo)
+    elif is_iterable(obj):
+        return recursive_pack_iterable(obj, memo)
+    else:
+        return recursive_pack_object(obj, memo)
+
+
+def recursive_deconvert(src, memo=None):
+    if memo is None:
+        memo = {}
+    if isinstance(src, primitives):
+        return src
+    elif isinstance(src, dict):
+        if src.get("__type__") == "ref":
+            return memo[src["__id__"]]
+        elif "function" in src.values():
+            return recursive_unpack_function(src, memo)
+        elif "object" in src.values():
+            return recursive_unpack_object(src, memo)
+        elif "class" in src.values():
+            return recursive_unpack_class(src, memo)
+        else:
+            return recursive_unpack_iterable(src, memo)
+    elif is_iterable(src):
+        return recursive_unpack_iterable(src, memo)
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from factory.factory import Factory
+from additional.additional import clear_code_cache
+from benchmarks.common import best_time
+
+OPERATIONS = ("dumps", "loads", "dump", "load")
+
+
+class Point:
+    def __init__(self, i):
+        self.x = i
+        self.y = -i
+        self.label = f'point {i}'
+
+    def norm(self):
+        return abs(self.x) + abs(self.y)
+
+
+def make_wide(size):
+    return {f'key{i}': i for i in range(size)}
+
+
+def make_deep(size):
+    root = node = {}
+    for _ in range(size):
+        child = {}
+        node['level'] = child
+        node = child
+    return root
+
+
+def make_long(size):
+    return {'items': [i * 0.5 for i in range(size)], 'names': [f'name{i}' for i in range(size)]}
+
+
+def make_functions(size):
+    # Distinct code objects. The code caches are also cleared before every
+    # run, so repeats measure packing them rather than cache hits.
+    space = {}
+    for i in range(size):
+        exec(f'def func{i}(x):\n    return x * {i} + {i + 1}', space)
+    return {f'func{i}': space[f'func{i}'] for i in range(size)}
+
+
+def make_instances(size):
+    return {f'point{i}': Point(i) for i in range(size)}
+
+
+# Payload builders and their sizes at --scale 1.
+PAYLOADS = {"wide": (make_wide, 20000), "deep": (make_deep, 500), "long": (make_long, 20000),
+            "functions": (make_functions, 100), "instances": (make_instances, 1000)}
+
+
+def peak_memory(func, arg):
+    # A separate run, tracemalloc slows everything it traces.
+    clear_code_cache()
+    tracemalloc.start()
+    try:
+        func(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(serializer, payload, path, repeat):
+    operations = {"dumps": (serializer.dumps, payload), "dump": (lambda obj: serializer.dump(obj, path), payload),
+                  "load": (serializer.load, path)}
+    results = {}
+    data = serializer.dumps(payload)
+    operations["loads"] = (serializer.loads, data)
+    serializer.dump(payload, path)
+    for name in OPERATIONS:
+        func, arg = operations[name]
+        seconds, _ = best_time(func, arg, repeat, clear_code_cache)
+        results[name] = {"seconds": seconds, "peak_bytes": peak_memory(func, arg)}
+    size = len(data.encode()) if isinstance(data, str) else len(data)
+    return results, size
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(formats, payloads, scale, repeat, baseline=None):
+    # With a baseline each operation also shows new/old time, so values
+    # above 1 are regressions.
+    baseline = baseline or {}
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for payload_name in payloads:
+            make, base = PAYLOADS[payload_name]
+            size = max(1, int(base * scale))
+            payload = make(size)
+            for fmt in formats:
+                entry = {"payload": payload_name, "size": size, "format": fmt}
+                try:
+                    entry["operations"], entry["bytes"] = run_case(Factory.create_serializer(fmt), payload,
+                                                                   os.path.join(folder, "payload" + fmt), repeat)
+                except Exception as error:
+                    entry["error"] = f"{type(error).__name__}: {error}"
+                results.append(entry)
+                print_entry(entry, baseline.get((payload_name, fmt)))
+    return results
+
+
+def print_entry(entry, baseline=None):
+    name = f"{entry['payload']:<10}{entry['format']:<8}"
+    if "error" in entry:
+        print(f"{name}error: {entry['error'][:80]}")
+        return
+    cells = []
+    for op in OPERATIONS:
+        stats = entry["operations"][op]
+        cell = f"{op} {stats['seconds']:8.4f}s {stats['peak_bytes'] / 2 ** 20:7.2f}MB"
+        old = baseline and baseline.get("operations", {}).get(op)
+        if old:
+            cell += f" ({stats['seconds'] / old['seconds']:.2f}x)"
+        cells.append(cell)
+    print(name + "  ".join(cells))
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return {(entry["payload"], entry["format"]): entry for entry in json.load(f)["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--formats", nargs="+", default=[".json", ".toml", ".yaml", ".pickle"],
+                        help="Formats to benchmark")
+    parser.add_argument("-p", "--payloads", nargs="+", default=list(PAYLOADS), choices=list(PAYLOADS),
+                        help="Payload shapes to generate")
+    parser.add_argument("-s", "--scale", type=float, default=1.0, help="Multiplier for every payload size")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per operation, best is reported")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("-c", "--compare", help="Results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    results = run_suite(args.formats, args.payloads, args.scale, args.repeat, baseline)
+    report = {"commit": git_commit(), "python": sys.version.split()[0], "platform": platform.platform(),
+              "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "scale": args.scale, "repeat": args.repeat,
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
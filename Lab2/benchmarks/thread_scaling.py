@@ -0,0 +1,51 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from factory.factory import Factory
+
+
+def make_payload(i):
+    return {f'record{j}': {'id': j, 'owner': i, 'name': 'record name', 'score': j / 4, 'tags': ['alpha', 'beta']}
+            for j in range(200)}
+
+
+def load_file(path_file):
+    serializer = Factory.create_serializer(os.path.splitext(path_file)[1])
+    return len(serializer.load(path_file))
+
+
+def measure(executor_type, workers, paths):
+    # One shared, cached serializer per format in each worker.
+    with executor_type(workers) as executor:
+        list(executor.map(load_file, paths[:workers]))
+        start = time.perf_counter()
+        list(executor.map(load_file, paths, chunksize=1))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--files", type=int, default=200, help="Files in the batch")
+    parser.add_argument("-f", "--format", default=".json", help="Format of the files")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Pool sizes to try")
+    args = parser.parse_args()
+
+    serializer = Factory.create_serializer(args.format)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for i in range(args.files):
+            paths.append(os.path.join(folder, f'file{i}{args.format}'))
+            serializer.dump(make_payload(i), paths[-1])
+        print(f"{args.files} {args.format} files, {os.cpu_count()} cpus")
+        base = {}
+        for name, executor_type in (("threads", ThreadPoolExecutor), ("processes", ProcessPoolExecutor)):
+            for workers in args.workers:
+                elapsed = measure(executor_type, workers, paths)
+                base.setdefault(name, elapsed)
+                print(f"{name:<10}{workers:>3}  {args.files / elapsed:8.1f} files/s  {base[name] / elapsed:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import argparse
+from my_toml_serializer.toml_serializer import Toml
+from benchmarks.common import best_time
+from benchmarks.reference import LegacyTomlParser
+
+
+def make_document(sections):
+    # The root needs a plain key first, the old parser drops documents that
+    # open with a table.
+    config = {'title': 'benchmark'}
+    for i in range(sections):
+        config[f'section{i}'] = {'name': 'host', 'port': i, 'ratio': 0.25, 'enabled': True,
+                                 'tags': ['alpha', 'beta'], 'limits': {'soft': 10, 'hard': 20}}
+    return Toml().to_str(config)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--sections", type=int, default=20000, help="Top level tables in the document")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Runs per parser, best is reported")
+    parser.add_argument("--no-legacy", action="store_true", help="Skip the old character scanner")
+    args = parser.parse_args()
+
+    s = make_document(args.sections)
+    mb = len(s) / 2 ** 20
+    new, _ = best_time(Toml().from_str, s, args.repeat)
+    print(f"document:  {mb:.1f} MB, {args.sections} sections")
+    print(f"lines:     {new:.2f} s  {mb / new:.1f} MB/s")
+    if not args.no_legacy:
+        old, _ = best_time(LegacyTomlParser().parse, s, args.repeat)
+        print(f"legacy:    {old:.2f} s  {mb / old:.1f} MB/s")
+        print(f"speedup:   {old / new:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import tempfile
+from functools import partial
+from factory.factory import Factory
+from serializer import transcode
+from benchmarks.common import best_time
+
+
+class Record:
+    def __init__(self, i):
+        self.id = i
+        self.name = f'record {i}'
+        self.tags = ['alpha', 'beta']
+
+    def label(self):
+        return f'{self.id}: {self.name}'
+
+
+def scale(x):
+    return x * 2
+
+
+def make_payload(count):
+    return {'records': [Record(i) for i in range(count)], 'handlers': [scale, Record.label],
+            'table': [{'id': i, 'ratio': i / 4} for i in range(count)]}
+
+
+def round_trip(src_format, dest_format, path_file, dest_path):
+    loaded = Factory.create_serializer(src_format).load(path_file)
+    Factory.create_serializer(dest_format).dump(loaded, dest_path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=5000, help="Objects and table rows in the payload")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per pipeline, best is reported")
+    parser.add_argument("-s", "--source", default=".json", help="Source format")
+    parser.add_argument("-d", "--dest", default=".yaml", help="Target format")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path_file = os.path.join(folder, 'payload' + args.source)
+        dest_path = os.path.join(folder, 'payload' + args.dest)
+        Factory.create_serializer(args.source).dump(make_payload(args.count), path_file)
+        old, _ = best_time(partial(round_trip, args.source, args.dest, path_file), dest_path, args.repeat)
+        new, _ = best_time(partial(transcode, args.source, args.dest, path_file), dest_path, args.repeat)
+    print(f"{args.source} -> {args.dest}, {args.count} objects")
+    print(f"load/dump: {old:.3f} s")
+    print(f"transcode: {new:.3f} s")
+    print(f"speedup:   {old / new:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+import struct
+import sys
+from itertools import chain
+from additional.additional import Packing, open_file
+
+MAGIC = b'LB2\x01'
+NONE, FALSE, TRUE, INT, FLOAT, STR, STR_REF, LIST, TUPLE, SET, DICT = range(11)
+# Tags from SMALL_TAG up are ints in SMALL_MIN..SMALL_MAX stored in the tag itself.
+SMALL_TAG, SMALL_BIAS, SMALL_MIN, SMALL_MAX = 0x80, 0xc0, -64, 63
+SEQUENCE_TAGS = {list: LIST, tuple: TUPLE, set: SET}
+BASES = (bool, int, float, str, dict, list, tuple, set)
+KNOWN = frozenset(BASES + (type(None),))
+BUILDERS = {LIST: None, TUPLE: tuple, SET: set, DICT: None}
+EMPTY = {LIST: list, TUPLE: tuple, SET: set, DICT: dict}
+DOUBLE = struct.Struct('<d')
+CHUNK_SIZE = 1 << 16
+
+
+def write_varint(out, n):
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos, first):
+    # first is the byte already read at pos - 1 and has its high bit set.
+    n = first & 0x7f
+    shift = 7
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def base_type(value):
+    for base in BASES:
+        if isinstance(value, base):
+            return base
+    raise TypeError(f"can't serialize {type(value).__name__} to binary")
+
+
+class Binary(Packing):
+    # Layout: MAGIC, then one value. A value is a one byte tag followed by
+    # its payload: nothing for small ints, zigzag varint for INT, 8 byte
+    # little-endian double for FLOAT, varint length plus utf-8 for STR,
+    # varint table index for STR_REF, varint item count plus the items for
+    # LIST/TUPLE/SET and varint pair count plus alternating keys and values
+    # for DICT. Every STR is appended to the string table, so each distinct
+    # string is stored once.
+    def dumps(self, obj):
+        return self.to_bytes(self.pack(obj))
+
+    def dump(self, obj, fp, level=None):
+        with open_file(fp, 'wb', level) as f:
+            self.emit(self.pack(obj), f.write)
+
+    def loads(self, s):
+        return self.unpack(self.from_bytes(s))
+
+    def load(self, fp):
+        if hasattr(fp, 'read'):
+            return self.unpack(self.from_stream(fp))
+        with open_file(fp, 'rb') as f:
+            return self.unpack(self.from_stream(f))
+
+    def from_stream(self, f):
+        # The file is read CHUNK_SIZE at a time, the decoder asks for more
+        # whenever a value runs past what it has.
+        data = f.read(CHUNK_SIZE)
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a binary document")
+        try:
+            value, extra = self.decode(data, memoryview(data), len(MAGIC), f.read)
+        except (IndexError, struct.error):
+            raise ValueError("unexpected end of binary document") from None
+        if extra or f.read(1):
+            raise ValueError("extra data after binary document")
+        return value
+
+    def to_bytes(self, obj):
+        return bytes(self.emit(obj))
+
+    def emit(self, obj, write=None):
+        # With write the output goes out in CHUNK_SIZE pieces, otherwise
+        # the whole document is returned.
+        out = bytearray(MAGIC)
+        append = out.append
+        limit = CHUNK_SIZE if write is not None else sys.maxsize
+        strings = {}
+        known = KNOWN
+        stack = [iter((obj,))]
+        while stack:
+            for value in stack[-1]:
+                if len(out) >= limit:
+                    write(out)
+                    out.clear()
+                cls = value.__class__
+                if cls not in known:
+                    cls = base_type(value)
+                if cls is str:
+                    index = strings.get(value)
+                    if index is not None:
+                        append(STR_REF)
+                        if index < 0x80:
+                            append(index)
+                        else:
+                            write_varint(out, index)
+                        continue
+                    strings[value] = len(strings)
+                    raw = value.encode()
+                    append(STR)
+                    if len(raw) < 0x80:
+                        append(len(raw))
+                    else:
+                        write_varint(out, len(raw))
+                    if len(raw) >= limit:
+                        write(out)
+                        out.clear()
+                        write(raw)
+                    else:
+                        out += raw
+                elif cls is int:
+                    if SMALL_MIN <= value <= SMALL_MAX:
+                        append(value + SMALL_BIAS)
+                    else:
+                        append(INT)
+                        write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+                elif cls is bool:
+                    append(TRUE if value else FALSE)
+                elif value is None:
+                    append(NONE)
+                elif cls is float:
+                    append(FLOAT)
+                    out += DOUBLE.pack(value)
+                elif cls is dict:
+                    append(DICT)
+                    write_varint(out, len(value))
+                    if value:
+                        stack.append(chain.from_iterable(value.items()))
+                        break
+                else:
+                    append(SEQUENCE_TAGS[cls])
+                    write_varint(out, len(value))
+                    if value:
+                        stack.append(iter(value))
+                        break
+            else:
+                stack.pop()
+        if write is not None:
+            write(out)
+        return out
+
+    def from_bytes(self, data):
+        # Strings and floats are read straight out of the buffer through a
+        # memoryview, without slicing copies of it.
+        view = memoryview(data)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a binary document")
+        try:
+            value, extra = self.decode(data, view, len(MAGIC))
+        except (IndexError, struct.error):
+            raise ValueError("unexpected end of binary document") from None
+        if extra:
+            raise ValueError("extra data after binary document")
+        return value
+
+    def decode(self, data, view, pos, read=None):
+        # The open container lives in kind/out/remaining, enclosing ones on
+        # the stack. A dict counts keys and values, so an odd remaining
+        # count after taking a value means that value was a key. Nothing
+        # changes until a value is read whole, so when one runs past the
+        # end of data, read(size) supplies more and the value starts over.
+        # Returns the value and the number of bytes left after it.
+        strings = []
+        stack = []
+        kind, out, remaining, key = LIST, [], 1, None
+        start = pos
+        while True:
+            try:
+                while remaining:
+                    start = pos
+                    tag = data[pos]
+                    pos += 1
+                    if tag >= SMALL_TAG:
+                        value = tag - SMALL_BIAS
+                    elif tag == STR_REF:
+                        n = data[pos]
+                        pos += 1
+                        if n > 0x7f:
+                            n, pos = read_varint(data, pos, n)
+                        value = strings[n]
+                    elif tag == STR:
+                        n = data[pos]
+                        pos += 1
+                        if n > 0x7f:
+                            n, pos = read_varint(data, pos, n)
+                        if pos + n > len(view):
+                            raise IndexError
+                        value = str(view[pos:pos + n], 'utf-8')
+                        pos += n
+                        strings.append(value)
+                    elif tag == INT:
+                        n = data[pos]
+                        pos += 1
+                        if n > 0x7f:
+                            n, pos = read_varint(data, pos, n)
+                        value = -((n + 1) >> 1) if n & 1 else n >> 1
+                    elif tag == NONE:
+                        value = None
+                    elif tag == TRUE:
+                        value = True
+                    elif tag == FALSE:
+                        value = False
+                    elif tag == FLOAT:
+                        value = DOUBLE.unpack_from(view, pos)[0]
+                        pos += 8
+                    elif tag in EMPTY:
+                        n = data[pos]
+                        pos += 1
+                        if n > 0x7f:
+                            n, pos = read_varint(data, pos, n)
+                        if n:
+                            stack.append((kind, out, remaining, key))
+                            if tag == DICT:
+                                kind, out, remaining = tag, {}, 2 * n
+                            else:
+                                kind, out, remaining = tag, [], n
+                            continue
+                        value = EMPTY[tag]()
+                    else:
+                        raise ValueError(f"unknown binary tag {tag}")
+                    remaining -= 1
+                    if kind != DICT:
+                        out.append(value)
+                    elif remaining & 1:
+                        key = value
+                    else:
+                        out[key] = value
+            except (IndexError, struct.error):
+                more = read(max(CHUNK_SIZE, len(view) - start)) if read is not None else b''
+                if not more:
+                    raise
+                data = data[start:] + more
+                view = memoryview(data)
+                pos = 0
+                continue
+            build = BUILDERS[kind]
+            value = out if build is None else build(out)
+            if not stack:
+                return out[0], len(view) - pos
+            kind, out, remaining, key = stack.pop()
+            remaining -= 1
+            if kind != DICT:
+                out.append(value)
+            elif remaining & 1:
+                key = value
+            else:
+                out[key] = value
@@ -1,156 +1,264 @@
 import inspect
 import builtins
-from additional.additional import convert, deconvert
+import re
+from functools import partial
+from additional.additional import (Packing, LITERALS, compression, from_collection, open_file, open_mapped,
+                                   dumps_parallel)
 
+TOKEN = re.compile(r'(?:"([^"]*)"\s*:\s*)?("[^"]*"|[^\s,":\[\]{}]+|[\[\]{}])')
+MAPPED_TOKEN = re.compile(TOKEN.pattern.encode())
+STRING, NUM, LITERAL, OPEN, CLOSE_LIST, CLOSE_DICT = range(6)
+DISPATCH = {'"': STRING, '-': NUM, 'n': LITERAL, 't': LITERAL, 'f': LITERAL,
+            '[': OPEN, '{': OPEN, ']': CLOSE_LIST, '}': CLOSE_DICT}
+DISPATCH.update((str(i), NUM) for i in range(10))
+CHUNK_SIZE = 1 << 16
 
-class Json:
+
+def safe_cut(chunk, inside):
+    # Position right after the last ',' in chunk that is outside every
+    # string, 0 if there's none, and whether chunk ends inside a string.
+    # inside says whether it starts in one; strings hold no '"', so each
+    # quote toggles.
+    inside ^= chunk.count('"') & 1
+    end = chunk.rfind('"') if inside else len(chunk)
+    while end >= 0:
+        # chunk[:end] ends outside a string, so does chunk[quote + 1:end].
+        quote = chunk.rfind('"', 0, end)
+        comma = chunk.rfind(',', quote + 1, end)
+        if comma >= 0:
+            return comma + 1, inside
+        if quote < 0:
+            break
+        end = chunk.rfind('"', 0, quote)
+    return 0, inside
+
+
+class JsonDecoder:
     def __init__(self):
-        self.pos = 0
-        self.nums = [str(i) for i in range(10)]
+        self.stack = []
+        self.keys = []
+        self.top = None
+        self.root = None
+        self.result = None
+        self.done = False
+        self.pending = []
+        self.inside = False
+
+    def feed(self, chunk, final=False):
+        # Text after the last safe ',' may end mid-token and waits in
+        # pending. Only the new chunk is scanned, the quote parity carries
+        # over, so a string spanning many chunks is joined once.
+        if self.done:
+            return
+        pending = self.pending
+        pending.append(chunk)
+        if not final:
+            cut, self.inside = safe_cut(chunk, self.inside)
+            if not cut:
+                return
+        buf = ''.join(pending) if len(pending) > 1 else chunk
+        end = len(buf) if final else len(buf) - len(chunk) + cut
+        pending.clear()
+        if end < len(buf):
+            pending.append(buf[end:])
+        self.consume(buf, end)
+        if final and not self.done and self.stack:
+            raise ValueError("unexpected end of json")
+
+    def feed_mapped(self, view):
+        # Scans the mapped bytes in place and decodes each token on its own.
+        if self.done:
+            return
+        self.consume(view, len(view), decode=True)
+        if not self.done and self.stack:
+            raise ValueError("unexpected end of json")
+
+    def pop_items(self):
+        if self.done or type(self.root) is not list:
+            return []
+        items = self.root[1:]
+        del self.root[1:]
+        return items
+
+    def consume(self, s, end, decode=False):
+        stack = self.stack
+        keys = self.keys
+        top = self.top
+        for m in (MAPPED_TOKEN if decode else TOKEN).finditer(s, 0, end):
+            key, token = m.groups()
+            if decode:
+                token = token.decode()
+                if key is not None:
+                    key = key.decode()
+            kind = DISPATCH.get(token[0])
+            if kind == STRING:
+                value = token[1:-1]
+            elif kind == NUM:
+                if '.' in token or 'e' in token or 'E' in token:
+                    value = float(token)
+                else:
+                    value = int(token)
+            elif kind == OPEN:
+                stack.append(top)
+                keys.append(key)
+                top = [] if token == '[' else {}
+                if self.root is None:
+                    self.root = top
+                continue
+            elif kind == CLOSE_LIST or kind == CLOSE_DICT:
+                if not stack or (kind == CLOSE_LIST) != (type(top) is list):
+                    raise ValueError(f"unexpected {token!r} at {m.start(2)}")
+                value = from_collection(top) if kind == CLOSE_LIST else top
+                top = stack.pop()
+                key = keys.pop()
+            elif kind == LITERAL and token in LITERALS:
+                value = LITERALS[token]
+            else:
+                raise ValueError(f"unexpected {token!r} at {m.start(2)}")
+
+            if type(top) is list:
+                top.append(value)
+            elif top is None:
+                self.result = value
+                self.done = True
+                break
+            else:
+                top[key] = value
+        self.top = top
+
+
+def encode_chunk(data_only, is_dict, memo, chunk):
+    # Runs in a worker process: packs and emits one run of top-level items.
+    serializer = Json(data_only)
+    parts = []
+    if is_dict:
+        serializer.emit_entries(serializer.pack(dict(chunk), memo), parts.append)
+    else:
+        serializer.emit_items(serializer.pack(chunk, memo), parts.append)
+    return ''.join(parts)
+
+
+def join_chunks(kind, texts):
+    if kind is dict:
+        return '{' + ', '.join(texts) + '}'
+    return f'["__{kind.__name__}__"' + ''.join(texts) + ']'
+
 
-    def dumps(self, obj):
-        return self.to_str(convert(obj))
+class Json(Packing):
+    def dumps(self, obj, workers=None):
+        # With workers a big top-level container is encoded in chunks across
+        # processes. Identity isn't kept across chunks: an object reachable
+        # from two chunks loads back as two copies.
+        if workers and workers > 1:
+            text = dumps_parallel(obj, workers, partial(encode_chunk, self.data_only), join_chunks)
+            if text is not None:
+                return text
+        return self.to_str(self.pack(obj))
 
-    def dump(self, obj, fp):
-        with open(fp, 'w+') as f:
-            f.write(self.dumps(obj))
+    def dump(self, obj, fp, flush_threshold=CHUNK_SIZE, level=None):
+        with open_file(fp, 'w+', level, buffering=flush_threshold or -1) as f:
+            self.emit(self.pack(obj), f.write)
 
     def loads(self, s):
-        self.pos = 0
-        return deconvert(self.from_str(s))
+        return self.unpack(self.from_str(s))
 
-    def load(self, fp):
-        with open(fp, 'r') as f:
-            return self.loads(f.read())
+    def load(self, fp, mapped=False):
+        if hasattr(fp, 'read'):
+            return self.unpack(self.decode(fp))
+        if mapped and not compression(fp):
+            decoder = JsonDecoder()
+            with open_mapped(fp) as view:
+                decoder.feed_mapped(view)
+            return self.unpack(decoder.result)
+        with open_file(fp, 'r') as f:
+            return self.unpack(self.decode(f))
+
+    def decode(self, f):
+        decoder = JsonDecoder()
+        for chunk in iter(partial(f.read, CHUNK_SIZE), ''):
+            decoder.feed(chunk)
+        decoder.feed('', final=True)
+        return decoder.result
+
+    def iterload(self, fp):
+        if hasattr(fp, 'read'):
+            yield from self.iter_decoded(fp)
+            return
+        with open_file(fp, 'r') as f:
+            yield from self.iter_decoded(f)
+
+    def iter_decoded(self, f):
+        memo = {}
+        decoder = JsonDecoder()
+        for chunk in iter(partial(f.read, CHUNK_SIZE), ''):
+            decoder.feed(chunk)
+            for item in decoder.pop_items():
+                yield self.unpack(item, memo)
+        decoder.feed('', final=True)
+        if not decoder.done:
+            return
+        if type(decoder.root) is list:
+            for item in decoder.result:
+                yield self.unpack(item, memo)
+        else:
+            yield self.unpack(decoder.result, memo)
 
     def to_str(self, obj, name=''):
-        if isinstance(obj, (int, float, str, bool, type(None))):
-            return self.to_str_primitive(obj, name)
+        res = []
+        self.emit(obj, res.append, name)
+        return ''.join(res)
+
+    def emit(self, obj, write, name=''):
+        if name:
+            write(name)
+            write(': ')
         if isinstance(obj, (list, tuple, set)):
-            return self.to_str_collection(obj, name)
-        if isinstance(obj, dict):
-            return self.to_str_dict(obj, name)
-        return self.to_str_class_obj(obj, name)
-
-    def to_str_primitive(self, obj, name):
-        res = ''
-        if  name != '':
-            res += f'{name}: '        
+            self.emit_collection(obj, write)
+        elif isinstance(obj, dict):
+            self.emit_dict(obj, write)
+        else:
+            write(self.to_str_primitive(obj))
+
+    def to_str_primitive(self, obj):
+        if isinstance(obj, str):
+            return f'"{obj}"'
         if obj is None:
-            res += 'null'
-        elif isinstance(obj, bool):
-            res += 'true' if obj else 'false'
-        elif isinstance(obj, (int, float)):
-            res += str(obj)
-        elif isinstance(obj, str):
-            res += f'"{obj}"'
-        return res
-
-    def to_str_collection(self, obj, name):
-        res = ''
-        if len(name):
-            res += f'{name}: '
-        res += '[' + f'"__{type(obj).__name__}__", '
+            return 'null'
+        if isinstance(obj, bool):
+            return 'true' if obj else 'false'
+        if isinstance(obj, (int, float)):
+            return str(obj)
+        raise TypeError(f"can't emit {type(obj).__name__} as json")
+
+    def emit_collection(self, obj, write):
+        write(f'["__{type(obj).__name__}__"')
+        self.emit_items(obj, write)
+        write(']')
+
+    def emit_items(self, obj, write):
         for x in obj:
-            res += self.to_str(x) + ', '
-        if len(res) > 2 and res[-2] == ',':
-            res = res[:-2]
-        res += ']'
-        return res
-
-    def to_str_dict(self, obj, name):
-        res = ''
-        if len(name):
-            res += f'{name}: '
-        res += '{'
+            if isinstance(x, (list, tuple, set, dict)):
+                write(', ')
+                self.emit(x, write)
+            else:
+                write(', ' + self.to_str_primitive(x))
+
+    def emit_dict(self, obj, write):
+        write('{')
+        self.emit_entries(obj, write)
+        write('}')
+
+    def emit_entries(self, obj, write):
+        sep = ''
         for k, v in obj.items():
-            res += self.to_str(v, self.to_str(str(k))) + ', '        
-        if len(res) > 2 and res[-2] == ',':
-            res = res[:-2]
-            self.pos -= 2
-        res += '}'
-        self.pos += 2
-        return res
+            if isinstance(v, (list, tuple, set, dict)):
+                write(f'{sep}"{k}": ')
+                self.emit(v, write)
+            else:
+                write(f'{sep}"{k}": {self.to_str_primitive(v)}')
+            sep = ', '
 
     def from_str(self, s):
-        if self.pos >= len(s):
-            return
-        if s[self.pos] in self.nums:
-            return self.from_str_num(s)
-        elif s[self.pos:self.pos+4] == 'null':
-            return self.from_str_null(s)
-        elif s[self.pos:self.pos+4] == 'true':
-            return self.from_str_true(s)
-        elif s[self.pos:self.pos+5] == 'false':
-            return self.from_str_false(s)
-        if s[self.pos] == '"':
-            return self.from_str_str(s)
-        if s[self.pos] == '[':
-            return self.from_str_collection(s)
-        if s[self.pos] == '{':
-            return self.from_str_dict(s)
-
-    def from_str_str(self, s):
-        res = ""
-        self.pos += 1
-        if s[self.pos] == '"':
-            self.pos += 1
-        while self.pos < len(s) and s[self.pos] not in ('"', "'"):
-            res += s[self.pos]
-            self.pos += 1        
-        self.pos += 1
-        return res
-
-    def from_str_num(self, s):
-        s_pos = self.pos
-        while self.pos < len(s) and (s[self.pos] in self.nums or s[self.pos] == '.'):
-            self.pos += 1
-        num = s[s_pos:self.pos]
-
-        return float(num) if '.' in str(num) else int(num)
-    
-    def from_str_null(self, s):
-        self.pos += 4
-        return None
-    
-    def from_str_true(self, s):
-        self.pos += 4
-        return True
-    
-    def from_str_false(self, s):
-        self.pos += 5
-        return False
-
-    def from_str_collection(self, s):
-        res = []
-        self.pos += 1
-        s_type = self.from_str_str(s)
-        while self.pos < len(s) and s[self.pos] not in (']', '}', ')'):
-            if s[self.pos] == ' ' or s[self.pos] == ',':
-                self.pos += 1
-                continue
-            v = self.from_str(s)
-            res.append(v)
-            if self.pos < len(s) and s[self.pos] in (']', '}', ')'):
-                break
-            self.pos += 1
-        self.pos += 1
-        if s_type == '__tuple__':
-            return tuple(res)
-        elif s_type == '__set__':
-            return set(res)
-        return res
-
-    def from_str_dict(self, s):
-        res = {}
-        self.pos += 1
-        while self.pos < len(s) and s[self.pos] != '}':
-            while s[self.pos] in (' ', ','):
-                self.pos += 1
-                continue            
-            k = self.from_str_str(s)
-            self.pos = s.find(':', self.pos)+2
-            v = self.from_str(s)
-            res[k] = v
-        self.pos += 1
-        return res
\ No newline at end of file
+        decoder = JsonDecoder()
+        decoder.feed(s, final=True)
+        return decoder.result
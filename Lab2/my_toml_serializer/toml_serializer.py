@@ -1,38 +1,136 @@
 import inspect
 import builtins
-from additional.additional import convert, deconvert
-
-class Toml():
+import io
+import re
+from itertools import chain
+from additional.additional import (Packing, LITERALS, compression, from_collection, open_file, open_mapped,
+                                   mapped_lines)
+
+KEY_SEP = ' = '
+TOKEN = re.compile(r'"[^"]*"|[\[\]]|[^\s,\[\]"]+')
+
+
+def parse_scalar(token):
+    if len(token) > 1 and token[0] == '"' and token[-1] == '"':
+        return token[1:-1]
+    if token in LITERALS:
+        return LITERALS[token]
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def parse_document_scalar(text):
+    # A bare scalar document holds strings unquoted.
+    if text in LITERALS:
+        return LITERALS[text]
+    if text[:1] in '-0123456789':
+        value = parse_scalar(text)
+        if not isinstance(value, str):
+            return value
+    return text
+
+
+def read_collection(text, lines):
+    # A nested collection ends its own line, so one value may continue on
+    # the following lines until the brackets balance.
+    stack = []
+    while True:
+        for token in TOKEN.findall(text):
+            if token == '[':
+                stack.append([])
+            elif token == ']':
+                value = from_collection(stack.pop())
+                if not stack:
+                    return value
+                stack[-1].append(value)
+            elif stack:
+                stack[-1].append(parse_scalar(token))
+        text = next(lines, None)
+        if text is None:
+            raise ValueError("unexpected end of toml collection")
+
+
+class TomlParser:
+    # Every table is indexed by its dotted path, so a [a.b.c] header finds
+    # its table with one lookup. Keys after a blank line belong to the root
+    # table: a nested table ends with a blank line and every other parent
+    # repeats its header before its next key.
     def __init__(self):
-        self.pos = 0
-        self.nums = [str(i) for i in range(10)]
-        self.depth = 0
+        self.root = {}
+        self.tables = {'': self.root}
+
+    def table(self, path):
+        table = self.tables.get(path)
+        if table is None:
+            parent, _, name = path.rpartition('.')
+            table = self.tables[path] = {}
+            self.table(parent)[name] = table
+        return table
+
+    def parse(self, lines):
+        lines = iter(lines)
+        current = self.root
+        blank = False
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line:
+                blank = True
+                continue
+            if line[0] == '[' and line[-1] == ']' and KEY_SEP not in line:
+                current = self.table(line[1:-1])
+            else:
+                key, sep, value = line.partition(KEY_SEP)
+                if not sep:
+                    raise ValueError(f"invalid toml line: {line!r}")
+                if blank:
+                    current = self.root
+                if value[:1] == '[':
+                    current[key] = read_collection(value, lines)
+                else:
+                    current[key] = parse_scalar(value)
+            blank = False
+        return self.root
 
-    def dumps(self, obj):
-        r = convert(obj)
-        return self.to_str(r)
 
-    def dump(self, obj, fp):
-        with open(fp, 'w+') as f:
-            f.write(self.dumps(obj))
+class Toml(Packing):
 
-    def loads(self, s):
-        self.pos = 0
-        self.depth = 0
-        r = self.from_str(s)
-        return deconvert(r)
+    def dumps(self, obj):
+        return self.to_str(self.pack(obj))
 
-    def load(self, fp):
-        with open(fp, 'r') as f:
-            return self.loads(f.read())
+    def dump(self, obj, fp, level=None):
+        with open_file(fp, 'w+', level) as f:
+            self.emit(self.pack(obj), f.write)
 
-    def to_str(self, obj, name='', path=''):
+    def loads(self, s):
+        return self.unpack(self.from_str(s))
+
+    def load(self, fp, mapped=False):
+        if hasattr(fp, 'read'):
+            return self.unpack(self.from_lines(fp))
+        if mapped and not compression(fp):
+            with open_mapped(fp) as view:
+                return self.unpack(self.from_lines(mapped_lines(view)))
+        with open_file(fp, 'r') as f:
+            return self.unpack(self.from_lines(f))
+
+    def to_str(self, obj):
+        parts = []
+        self.emit(obj, parts.append)
+        return ''.join(parts)
+
+    def emit(self, obj, write):
         if isinstance(obj, (int, float, str, bool, type(None))):
-            return self.to_str_primitive(obj, name)
-        if isinstance(obj, (list, tuple, set)):
-            return self.to_str_collection(obj, name)
-        if isinstance(obj, dict):
-            return self.to_str_dict(obj, name, path)
+            write(self.to_str_primitive(obj, ''))
+        elif isinstance(obj, (list, tuple, set)):
+            self.emit_collection(obj, '', write)
+        elif isinstance(obj, dict):
+            self.emit_table(obj, '', '', write)
 
     def to_str_primitive(self, obj, name):
         res = ''
@@ -51,166 +149,88 @@ class Toml():
                 res += f'"{obj}"'
         return res
 
-    def to_str_collection(self, obj, name):
-        res = ''
-        if len(name):                    
-            res += f'{name} = '
-        res += '[ ' + f'"__{type(obj).__name__}__", '    
+    def emit_collection(self, obj, name, write):
+        if len(name):
+            write(f'{name} = ')
+        write(f'[ "__{type(obj).__name__}__", ')
         for x in obj:
-            if isinstance(x, str): 
-                res += ' '+ f'"{self.to_str(x)}"' + ','
+            if isinstance(x, str):
+                write(f' "{x}",')
+            elif isinstance(x, (list, tuple, set)):
+                write(' ')
+                self.emit_collection(x, '', write)
+                write(',')
+            elif isinstance(x, dict):
+                write(' ')
+                self.emit_table(x, '', '', write)
+                write(',')
             else:
-                res += ' '+ self.to_str(x) + ','
-        res += ']\n'
-        return res
+                write(' ' + self.to_str_primitive(x, '') + ',')
+        write(']\n')
 
-    def to_str_dict(self, obj, name, path):
-        res = ''
+    def open_table(self, obj, name, path, write):
+        # A named table starts with its header.
         if len(name):
-            if path == '':
-                path += name
-            else:
-                path += '.' + name
-            if res[-2:] == '\n\n':
-                res += f'[{path}]\n'
-            else:
-                res += f'\n[{path}]\n'
-            if obj == {}:
-                return res 
-
-        for k, v in obj.items():
-            if res[-2:] == '\n\n' and path != '':
-                res += f'[{path}]\n'
-            new_res = self.to_str(v, self.to_str(str(k)), path)
-            res += new_res
-            if res[-1] != '\n':
-                res += '\n'
-        if res[-2:] != '\n\n':
-            res += '\n'
-        return res
-
-    def from_str(self, s, curr_dict={}):
-        if self.pos >= len(s):
-            return
-        elif s[self.pos] in self.nums:
-            return self.from_str_num(s)
-        elif s[self.pos:self.pos+4] == 'null':
-            return self.from_str_null(s)
-        elif s[self.pos:self.pos+4] == 'true':
-            return self.from_str_true(s)
-        elif s[self.pos:self.pos+5] == 'false':
-            return self.from_str_false(s)
-        elif s[self.pos] == '[':
-            return self.from_str_collection(s)
-        elif s[self.pos] == ']' or s[self.pos] =='.':
-            return self.from_str_dict(s, curr_dict)
-        elif self.pos == 0:
-            return self.from_str_dict(s, curr_dict)
-        else:
-            return self.from_str_str(s)
-
-    def from_str_str(self, s):
-        res = ""
-        opened = False
-        while self.pos < len(s) and s[self.pos] not in ('\n', ',', ' ') or opened:
-            if s[self.pos] == '"':
-                if opened:
-                    opened = False
-                else:
-                    opened = True
-                self.pos += 1
-                continue
-            res += s[self.pos]
-            self.pos += 1        
-        self.pos += 1
-        return res
-
-    def from_str_num(self, s):
-        s_pos = self.pos
-        while self.pos < len(s) and (s[self.pos] in self.nums or s[self.pos] == '.'):
-            self.pos += 1
-        num = s[s_pos:self.pos]
-        self.pos += 1
-        return float(num) if '.' in str(num) else int(num)
-    
-    def from_str_null(self, s):
-        self.pos += 5
-        return None
-    
-    def from_str_true(self, s):
-        self.pos += 5
-        return True
-    
-    def from_str_false(self, s):
-        self.pos += 6
-        return False
-
-    def from_str_collection(self, s):
-        res = []
-        self.pos += 2
-        s_type = self.from_str_str(s)
-        self.pos += 1
-        while self.pos < len(s) and s[self.pos] != ']':
-            self.pos += 1
-            v = self.from_str(s)
-            res.append(v)
-        self.pos += 2
-        if s_type == '__tuple__':
-            return tuple(res)
-        elif s_type == '__set__':
-            return set(res)
-        return res
-
-    def from_str_dictname(self, s):
-        res = ""
-        while self.pos < len(s) and s[self.pos] not in (']', '.'):
-            res += s[self.pos]
-            self.pos += 1    
-        return res
-
-    def from_str_dict(self, s, curr_dict):
-        res = {}
-        if curr_dict != {}:
-            res = curr_dict        
-        if s[self.pos] == ']':
-            self.pos += 2        
-        if s[self.pos] == '\n':
-            self.depth -= 1
-            return res
-        if s[self.pos] == '.':
-            self.pos += 1
-            k = self.from_str_dictname(s)
-            v = res.get(k)
-            self.depth += 1
-            if v is None:
-                v = self.from_str(s)
-            else:
-                v = self.from_str_dict(s, v)
-            res[k] = v
-        while self.pos < len(s):   
-            if s[self.pos] == '\n':
-                if self.depth != 0:
-                    self.depth -= 1
-                    return res
-                self.pos += 1
-                if self.pos >= len(s):
-                    return res
-                if s[self.pos] == '[':
-                    self.pos += 1
-                    k = self.from_str_dictname(s)
-                    v = res.get(k)
-                    self.depth += 1
-                    if v is None:
-                        v = self.from_str(s)
-                    else:
-                        v = self.from_str_dict(s, v)
-                else: 
+            path = f'{path}.{name}' if path else name
+            write(f'\n[{path}]\n')
+            return iter(obj.items()), path, ']\n'
+        return iter(obj.items()), path, ''
+
+    def emit_table(self, obj, name, path, write):
+        # Tables still being written sit on a stack with their items, dotted
+        # path and the last two characters written inside them. A blank line
+        # there means a nested table just ended, so the header is repeated
+        # before the next key.
+        stack = []
+        items, path, tail = self.open_table(obj, name, path, write)
+        while True:
+            child = None
+            for k, v in items:
+                if tail == '\n\n' and path != '':
+                    write(f'[{path}]\n')
+                    tail = ']\n'
+                k = str(k)
+                if isinstance(v, dict):
+                    child = v
+                    break
+                if isinstance(v, (list, tuple, set)):
+                    self.emit_collection(v, k, write)
+                    tail = ']\n'
                     continue
-            else:    
-                k = self.from_str_str(s)  
-                if self.pos >= len(s):
-                    return k
-                self.pos += 2
-                v = self.from_str(s) 
-            res[k] = v
-        return res
\ No newline at end of file
+                line = self.to_str_primitive(v, k)
+                write(line)
+                tail = (tail + line[-2:])[-2:]
+                if tail[-1:] != '\n':
+                    write('\n')
+                    tail = tail[-1:] + '\n'
+            if child is not None:
+                stack.append((items, path, tail))
+                items, path, tail = self.open_table(child, k, path, write)
+                continue
+            if tail != '\n\n':
+                write('\n')
+                tail = tail[-1:] + '\n'
+            if not stack:
+                return
+            inner = tail
+            items, path, tail = stack.pop()
+            tail = (tail + inner)[-2:]
+            if tail[-1:] != '\n':
+                write('\n')
+                tail = tail[-1:] + '\n'
+
+    def from_str(self, s):
+        return self.from_lines(io.StringIO(s))
+
+    def from_lines(self, lines):
+        # lines is any iterable of text lines, e.g. an open file, so the
+        # document never has to be in memory as a whole.
+        lines = iter(lines)
+        first = next(lines, None)
+        if first is None:
+            return None
+        if first.startswith('[ "__'):
+            return read_collection(first, lines)
+        if first.rstrip('\n') and KEY_SEP not in first:
+            return parse_document_scalar(first + ''.join(lines))
+        return TomlParser().parse(chain((first,), lines))
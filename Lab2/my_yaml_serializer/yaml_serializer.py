@@ -1,37 +1,209 @@
 import inspect
 import builtins
-from additional.additional import convert, deconvert
+from functools import partial
+from itertools import chain
+from additional.additional import (Packing, LITERALS, compression, from_collection, open_file, open_mapped,
+                                   mapped_lines, dumps_parallel)
 
+MAP, SEQ = range(2)
+INDENT, KIND, CONTAINER, KEY, PENDING = range(5)
+DOCUMENT = '---'
 
-class Yaml:
+
+def quote(s):
+    return "'" + s.replace("'", "''") + "'"
+
+
+def parse_scalar(text):
+    if len(text) > 1 and text[0] == "'" and text[-1] == "'":
+        return text[1:-1].replace("''", "'")
+    if text in LITERALS:
+        return LITERALS[text]
+    if text == '{}':
+        return {}
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def split_key(text):
+    # "key:" opens a nested block (rest is None), "key: " holds ''.
+    key, sep, rest = text.partition(': ')
+    if sep:
+        return key, rest
+    if text[-1:] == ':':
+        return text[:-1], None
+    return None
+
+
+class YamlParser:
+    # Open blocks sit on a stack as [indent, kind, container, key, pending]:
+    # key is where the finished block goes in the block below it and
+    # pending is a "key:" of a mapping still waiting for its nested block.
+    # A sequence under a key may sit at the key's own indent.
     def __init__(self):
-        self.pos = 0
-        self.nums = [str(i) for i in range(10)]
+        self.stack = []
+        self.result = None
+
+    def parse(self, lines):
+        for line in lines:
+            indent = len(line) - len(line.lstrip(' '))
+            if indent < len(line):
+                self.line(line[indent:], indent)
+        while self.stack:
+            self.pop()
+        return self.result
+
+    def pop(self):
+        frame = self.stack.pop()
+        if frame[KIND] == SEQ:
+            value = from_collection(frame[CONTAINER])
+        else:
+            value = frame[CONTAINER]
+            if frame[PENDING] is not None:
+                value[frame[PENDING]] = None
+        if not self.stack:
+            self.result = value
+        elif self.stack[-1][KIND] == SEQ:
+            self.stack[-1][CONTAINER].append(value)
+        else:
+            self.stack[-1][CONTAINER][frame[KEY]] = value
+
+    def line(self, text, indent, inline=False):
+        stack = self.stack
+        item = text[:2] == '- ' or text == '-'
+        while not inline and stack:
+            top = stack[-1]
+            if top[INDENT] > indent or top[INDENT] == indent and top[KIND] == SEQ and not item:
+                self.pop()
+            else:
+                break
+        top = stack[-1] if stack else None
+        if top is None or top[INDENT] < indent or top[KIND] == MAP and item:
+            # A new block: the document root, an item's inline block or
+            # the value of a pending key.
+            key = None
+            if inline:
+                pass
+            elif top is None:
+                if self.result is not None:
+                    raise ValueError("yaml document has more than one root")
+            elif top[KIND] == MAP and top[PENDING] is not None:
+                key = top[PENDING]
+                top[PENDING] = None
+            else:
+                raise ValueError(f"bad yaml indentation: {text!r}")
+            top = [indent, SEQ, [], key, None] if item else [indent, MAP, {}, key, None]
+            stack.append(top)
+        elif top[KIND] == MAP and top[PENDING] is not None:
+            top[CONTAINER][top[PENDING]] = None
+            top[PENDING] = None
+
+        if item:
+            rest = text[2:]
+            if rest[:1] != "'" and (rest[:2] == '- ' or rest == '-' or split_key(rest) is not None):
+                self.line(rest, indent + 2, inline=True)
+            else:
+                top[CONTAINER].append(parse_scalar(rest) if rest else None)
+            return
+        pair = split_key(text)
+        if pair is None:
+            raise ValueError(f"expected a yaml key: {text!r}")
+        key, rest = pair
+        if rest is None:
+            top[PENDING] = key
+        else:
+            top[CONTAINER][key] = parse_scalar(rest)
+
+
+def encode_chunk(data_only, is_dict, memo, chunk):
+    # Runs in a worker process: packs and emits one run of top-level items.
+    serializer = Yaml(data_only)
+    parts = []
+    if is_dict:
+        serializer.emit_dict(serializer.pack(dict(chunk), memo), parts.append)
+    else:
+        serializer.emit_items(serializer.pack(chunk, memo), parts.append)
+    return ''.join(parts)
+
+
+def join_chunks(kind, texts):
+    # A block document is just the chunks one after another.
+    if kind is dict:
+        return ''.join(texts)
+    return f"- '__{kind.__name__}__'\n" + ''.join(texts)
 
-    def dumps(self, obj):
-        return self.to_str(convert(obj))
 
-    def dump(self, obj, fp):
-        with open(fp, 'w+') as f:
-            f.write(self.dumps(obj))
+class Yaml(Packing):
+
+    def dumps(self, obj, workers=None):
+        # With workers a big top-level container is encoded in chunks across
+        # processes. Identity isn't kept across chunks: an object reachable
+        # from two chunks loads back as two copies.
+        if workers and workers > 1:
+            text = dumps_parallel(obj, workers, partial(encode_chunk, self.data_only), join_chunks)
+            if text is not None:
+                return text
+        return self.to_str(self.pack(obj))
+
+    def dump(self, obj, fp, level=None):
+        with open_file(fp, 'w+', level) as f:
+            self.emit(self.pack(obj), f.write)
 
     def loads(self, s):
-        self.pos = 0
-        return deconvert(self.from_str(s))
+        return self.unpack(self.from_str(s))
+
+    def load(self, fp, mapped=False):
+        # Lines are parsed as they are read, the file is never held as one
+        # string.
+        if hasattr(fp, 'read'):
+            return self.unpack(self.from_lines(line.rstrip('\n') for line in fp))
+        if mapped and not compression(fp):
+            with open_mapped(fp) as view:
+                return self.unpack(self.from_lines(line.rstrip('\n') for line in mapped_lines(view)))
+        with open_file(fp, 'r') as f:
+            return self.unpack(self.from_lines(line.rstrip('\n') for line in f))
+
+    def dump_all(self, objs, fp, level=None):
+        # Each document is converted and written on its own, so only one
+        # of them is ever held as text.
+        with open_file(fp, 'w+', level) as f:
+            for obj in objs:
+                f.write(DOCUMENT + '\n')
+                packed = self.pack(obj)
+                self.emit(packed, f.write)
+                # Only blocks end with a line break.
+                if not isinstance(packed, (list, tuple, set, dict)) or packed == {}:
+                    f.write('\n')
+
+    def iterload(self, fp):
+        if hasattr(fp, 'read'):
+            yield from map(self.unpack, self.iter_documents(fp))
+            return
+        with open_file(fp, 'r') as f:
+            yield from map(self.unpack, self.iter_documents(f))
 
-    def load(self, fp):
-        with open(fp, 'r') as f:
-            return self.loads(f.read())
+    def to_str(self, obj):
+        parts = []
+        self.emit(obj, parts.append)
+        return ''.join(parts)
 
-    def to_str(self, obj, name='', tab = ''):
-        if isinstance(obj, (int, float, str, bool, type(None))):
-            return self.to_str_primitive(obj, name, tab)
+    def emit(self, obj, write, name='', tab='', first=None):
+        # first replaces tab on the first line of a block that starts on its
+        # parent item's line.
         if isinstance(obj, (list, tuple, set)):
-            return self.to_str_collection(obj, name, tab)
-        if isinstance(obj, dict):
-            return self.to_str_dict(obj, name, tab)
+            self.emit_collection(obj, write, name, tab, first)
+        elif isinstance(obj, dict):
+            self.emit_dict(obj, write, name, tab, first)
+        else:
+            write(self.to_str_primitive(obj, name))
 
-    def to_str_primitive(self, obj, name, tab):
+    def to_str_primitive(self, obj, name=''):
         res = ''
         if  name != '':
             res += f'{name}: '        
@@ -42,140 +214,75 @@ class Yaml:
         elif isinstance(obj, (int, float)):
             res += str(obj)
         elif isinstance(obj, str):
-            res += f'{obj}'
+            res += quote(obj)
+        else:
+            raise TypeError(f"can't emit {type(obj).__name__} as yaml")
         return res
 
-    def to_str_collection(self, obj, name, tab):
-        res = ''
+    def emit_collection(self, obj, write, name='', tab='', first=None):
         if len(name):
-            res += f'{name}:\n'
-        res += tab + '- '+ f"'__{type(obj).__name__}__'"+ '\n'
+            write(f'{name}:\n')
+        write((tab if first is None else first) + f"- '__{type(obj).__name__}__'\n")
+        self.emit_items(obj, write, tab)
+
+    def emit_items(self, obj, write, tab=''):
         for x in obj:
-            if isinstance(x, str):
-                res += tab + '- '+ f"'{self.to_str(x)}'" + '\n'
+            if isinstance(x, (list, tuple, set)) or isinstance(x, dict) and x:
+                # Nested blocks start on the item's line, one level deeper.
+                self.emit(x, write, '', tab + '  ', tab + '- ')
             else:
-                res += tab + '- '+ self.to_str(x) + '\n'
-        return res
+                write(tab + '- ' + self.to_str(x) + '\n')
 
-    def to_str_dict(self, obj, name, tab):
-        res = ''
+    def emit_dict(self, obj, write, name='', tab='', first=None):
+        if not name and obj == {}:
+            write('{}')
+            return
         if len(name):
-            res += f'{name}:'
+            write(f'{name}:')
             if obj == {}:
-                res += ' {}\n'
-                return res 
-            res += '\n'
+                write(' {}\n')
+                return
+            write('\n')
             tab += '  '
         for k, v in obj.items():
-            res += tab + self.to_str(v, self.to_str(str(k)), tab)
-            if res[-1] != '\n':
-                res += '\n'    
-        return res
+            write(tab if first is None else first)
+            first = None
+            if isinstance(v, (list, tuple, set, dict)):
+                self.emit(v, write, str(k), tab)
+            else:
+                write(self.to_str_primitive(v, str(k)) + '\n')
 
-    def from_str(self, s, tab=''):
-        if self.pos >= len(s):
-            return
-        elif s[self.pos] in self.nums:
-            return self.from_str_num(s)
-        elif s[self.pos:self.pos+4] == 'null':
-            return self.from_str_null(s)
-        elif s[self.pos:self.pos+4] == 'true':
-            return self.from_str_true(s)
-        elif s[self.pos:self.pos+5] == 'false':
-            return self.from_str_false(s)
-        elif s[self.pos] == '[' or s[self.pos+len(tab)] == '-':
-            return self.from_str_collection(s, tab)
-        elif s[self.pos+len(tab):self.pos+len(tab)+2] == '  ' or s[self.pos] =='{':
-            return self.from_str_dict(s, '  ')
-        elif self.pos == 0:
-            return self.from_str_dict(s, tab)
-        else:
-            return self.from_str_str(s)
-
-    def from_str_str(self, s):
-        res = ""
-        opened = False
-        while self.pos < len(s) and s[self.pos] not in(':', '\n') or opened:
-            if s[self.pos] == "'":
-                if opened:
-                    opened = False
-                else:
-                    opened = True
-                self.pos += 1
-                continue
-            res += s[self.pos]
-            self.pos += 1        
-        self.pos += 1
-        return res
+    def from_str(self, s):
+        return self.from_lines(s.split('\n'))
 
-    def from_str_num(self, s):
-        s_pos = self.pos
-        while self.pos < len(s) and (s[self.pos] in self.nums or s[self.pos] == '.'):
-            self.pos += 1
-        num = s[s_pos:self.pos]
-        self.pos += 1
-        return float(num) if '.' in str(num) else int(num)
-    
-    def from_str_null(self, s):
-        self.pos += 5
-        return None
-    
-    def from_str_true(self, s):
-        self.pos += 5
-        return True
-    
-    def from_str_false(self, s):
-        self.pos += 6
-        return False
-
-    def from_str_collection(self, s, tab):
-        res = []
-        self.pos += len(tab)
-        self.pos += 2
-        s_type = self.from_str_str(s)
-        if tab + '-' != s[self.pos:self.pos + len(tab) + 1]:
-            if s_type == '__tuple__':
-                return tuple(res)
-            elif s_type == '__set__':
-                return set(res)
-            return res
-        self.pos += len(tab)
-        while self.pos < len(s):
-            self.pos += 2
-            v = self.from_str(s)
-            res.append(v)
-            if tab + '-' != s[self.pos:self.pos + len(tab) + 1]:
+    def from_lines(self, lines):
+        # lines is any iterable holding one document without line breaks;
+        # a leading document marker is skipped.
+        lines = iter(lines)
+        for i, line in enumerate(lines):
+            text = line.lstrip(' ')
+            if text == DOCUMENT and not i:
+                continue
+            if text:
                 break
-            self.pos += len(tab)
-        if s_type == '__tuple__':
-            return tuple(res)
-        elif s_type == '__set__':
-            return set(res)
-        return res
+        else:
+            return None
+        lines = chain((line,), lines)
+        if text[0] != "'" and (text[:2] == '- ' or text == '-' or split_key(text) is not None):
+            return YamlParser().parse(lines)
+        return parse_scalar('\n'.join(lines).rstrip('\n'))
 
-    def from_str_dict(self, s, tab):
-        res = {}
-        if s[self.pos] == '{':
-            self.pos += 3
-            return res
-        while self.pos < len(s):
-            new_tab = ''
-            while s[self.pos] == ' ':
-                new_tab += ' '
-                self.pos += 1
-            if len(new_tab) >= len(tab):
-                tab = new_tab
-                k = self.from_str_str(s)
-                if self.pos >= len(s):
-                    return k
-                if s[self.pos] == ' ':
-                    self.pos += 1
-                    v = self.from_str(s, new_tab)
-                else:
-                    self.pos += 1
-                    v = self.from_str(s, new_tab)
-            elif len(new_tab) < len(tab):
-                self.pos -= len(new_tab)
-                return res
-            res[k] = v
-        return res
\ No newline at end of file
+    def iter_documents(self, f):
+        lines = []
+        started = False
+        for line in f:
+            line = line.rstrip('\n')
+            if line == DOCUMENT:
+                if started or any(lines):
+                    yield self.from_lines(lines)
+                lines = []
+                started = True
+            else:
+                lines.append(line)
+        if started or any(lines):
+            yield self.from_lines(lines)
@@ -1,15 +1,122 @@
 import pickle
-from additional.additional import convert, deconvert
+import weakref
+from additional.additional import (convert, deconvert, open_file, pack_leaf, pack_node, pack_plain_dict, unpack_node,
+                                   Memo, Packing, LEAVES, PACKERS, SEQUENCES, UNPACKERS)
 
-class Pickle:
-    def dump(self, obj, fp):
-        return pickle.dump(convert(obj),open(fp,'wb'))
+PROTOCOL = 5
+OUT_OF_BAND = 1 << 16
 
-    def dumps(self, obj):
-        return pickle.dumps(convert(obj))
 
-    def load(self, fp):
-        return deconvert(pickle.load(open(fp, 'rb')))
+class RawMemo(Memo):
+    def __init__(self):
+        super().__init__()
+        self.buffers = {}
 
-    def loads(self, s):
-        return deconvert(pickle.loads(s))
\ No newline at end of file
+
+def wrap(obj, memo):
+    # One wrapper per payload, so pickle's own memo writes a shared payload
+    # once and loads it back as a single object.
+    buffer = memo.buffers.get(id(obj))
+    if buffer is None:
+        buffer = memo.buffers[id(obj)] = pickle.PickleBuffer(obj)
+    return buffer
+
+
+def pack_bytes(obj, memo):
+    # Large payloads are wrapped so a buffer_callback gets them as
+    # out-of-band buffers instead of copies in the pickle stream.
+    if len(obj) >= OUT_OF_BAND:
+        return wrap(obj, memo), None
+    return obj, None
+
+
+def pack_memoryview(obj, memo):
+    if obj.contiguous and obj.nbytes >= OUT_OF_BAND:
+        return wrap(obj, memo), None
+    return obj.tobytes(), None
+
+
+RAW_PACKERS = {bytes: pack_bytes, bytearray: pack_bytes, memoryview: pack_memoryview,
+               pickle.PickleBuffer: pack_leaf}
+buffer_types = weakref.WeakKeyDictionary()
+
+
+def is_buffer(obj):
+    # Anything else exposing the buffer protocol (array.array, numpy arrays)
+    # is left to pickle, which knows how to reduce it.
+    cls = type(obj)
+    found = buffer_types.get(cls)
+    if found is None:
+        try:
+            memoryview(obj).release()
+            found = True
+        except TypeError:
+            found = False
+        buffer_types[cls] = found
+    return found
+
+
+def pack_raw_node(obj, memo):
+    packer = RAW_PACKERS.get(type(obj))
+    if packer is not None:
+        return packer(obj, memo)
+    if type(obj) not in PACKERS and is_buffer(obj):
+        return obj, None
+    return pack_node(obj, memo)
+
+
+def pack_data_node(obj, memo):
+    # Data-only mode: plain data plus buffers, which are wrapped the same
+    # way as in full mode. Anything else is refused like check_data does.
+    cls = type(obj)
+    if cls in LEAVES:
+        return obj, None
+    if cls is dict:
+        for key in obj:
+            if key.__class__ not in LEAVES:
+                raise TypeError(f"{key.__class__.__name__} key is not plain data")
+        return pack_plain_dict(obj, memo)
+    if cls in SEQUENCES:
+        return PACKERS[cls](obj, memo)
+    packer = RAW_PACKERS.get(cls)
+    if packer is not None:
+        return packer(obj, memo)
+    if is_buffer(obj):
+        return obj, None
+    raise TypeError(f"{cls.__name__} is not plain data")
+
+
+def unpack_raw_node(src, memo):
+    if type(src) not in UNPACKERS and is_buffer(src):
+        return src, None
+    return unpack_node(src, memo)
+
+
+class Pickle(Packing):
+    def pack(self, obj):
+        if self.data_only:
+            return convert(obj, RawMemo(), pack_data_node)
+        return convert(obj, RawMemo(), pack_raw_node)
+
+    def unpack(self, src, memo=None):
+        if self.data_only:
+            return src
+        return deconvert(src, memo, unpack_raw_node)
+
+    def dump(self, obj, fp, buffer_callback=None, level=None):
+        if hasattr(fp, 'write'):
+            return pickle.dump(self.pack(obj), fp, PROTOCOL, buffer_callback=buffer_callback)
+        with open_file(fp, 'wb', level) as f:
+            pickle.dump(self.pack(obj), f, PROTOCOL, buffer_callback=buffer_callback)
+
+    def dumps(self, obj, buffer_callback=None):
+        return pickle.dumps(self.pack(obj), PROTOCOL, buffer_callback=buffer_callback)
+
+    def load(self, fp, buffers=None):
+        if hasattr(fp, 'read'):
+            return self.unpack(pickle.load(fp, buffers=buffers))
+        with open_file(fp, 'rb') as f:
+            return self.unpack(pickle.load(f, buffers=buffers))
+
+    def loads(self, s, buffers=None):
+        return self.unpack(pickle.loads(s, buffers=buffers))
@@ -1,21 +1,287 @@
 import argparse
 import configparser
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
 from pathlib import Path
 from factory.factory import Factory
+from additional.additional import compression
 
+MANIFEST = '.serializer_hashes'
+CONVERTED, CACHED, SKIPPED, FAILED = 'converted', 'cached', 'skipped', 'failed'
+HASH_CHUNK = 1 << 20
+CACHE_DIR = os.environ.get('LAB2_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'lab2_serializer'))
+CACHE_SIZE = 256 << 20
+# Part of every cache key. Bump it whenever an emitter's output changes, so
+# entries written by an older version are never served.
+CACHE_VERSION = '1'
+CACHE_ENTRY = re.compile('[0-9a-f]{64}')
+# A temporary file this old was left by a killed worker, younger ones may
+# still be written by a running store().
+TEMP_GRACE = 3600
 
-def serialize(dest_format, path_file):
-    serializer = Factory.create_serializer(dest_format)
+
+def split_suffixes(path_file):
+    # data.json.gz -> (data.json, .json, .gz)
+    path = Path(path_file)
+    compressed = compression(path)
+    if compressed:
+        path = path.with_suffix('')
+    return path, path.suffix, compressed
+
+
+def source_format(path_file):
+    return split_suffixes(path_file)[1]
+
+
+def output_path(path_file, dest_format, compress=None):
+    # The output keeps the source's compression unless compress names
+    # another one ('' for none).
+    path, _, compressed = split_suffixes(path_file)
+    if compress is not None:
+        compressed = compress
+    return Path(path.parent, f"{path.stem}{dest_format}{compressed}")
+
+
+def transcode(src_format, dest_format, path_file, dest_path, data_only=False, level=None):
+    # The packed tree goes from the parser straight to the emitter: the
+    # data-only reader skips deconvert and the data-only writer only checks
+    # the tree instead of running convert. Trees that aren't plain data
+    # (non-scalar keys, pickled buffers) take the full load/dump path.
+    options = {} if level is None else {'level': level}
+    tree = Factory.create_serializer(src_format, True).load(path_file)
+    try:
+        Factory.create_serializer(dest_format, True).dump(tree, dest_path, **options)
+    except TypeError:
+        if data_only:
+            raise
+        loaded = Factory.create_serializer(src_format).unpack(tree)
+        Factory.create_serializer(dest_format).dump(loaded, dest_path, **options)
+
+
+def serialize(dest_format, path_file, data_only=False, compress=None, level=None, cache_dir=None,
+              cache_size=CACHE_SIZE):
     try:
-        src_format = Path(path_file).suffix
-        if src_format == dest_format:
+        if output_path(path_file, dest_format, compress) == Path(path_file):
             return
-        deserializer = Factory.create_serializer(src_format)
-        abs_path = Path(path_file)
-        loaded = deserializer.load(path_file)
-        serializer.dump(loaded, Path(abs_path.parent, f"{abs_path.stem}{dest_format}"))
+        convert_file(dest_format, path_file, data_only, None, compress, level, cache_dir)
     except FileNotFoundError:
         print("wrong path or format")
+        return
+    if cache_dir is not None:
+        ConversionCache(cache_dir).evict(cache_size)
+
+
+def file_digest(path_file):
+    digest = hashlib.sha256()
+    with open(path_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    # Outputs are stored under a hash of the input content and everything
+    # that shapes the output. An entry's mtime is its last use, eviction
+    # drops the least recently used entries first.
+    def __init__(self, folder):
+        self.folder = folder
+
+    def key(self, digest, path_file, dest_path, data_only, level):
+        parts = (CACHE_VERSION, digest, ''.join(split_suffixes(path_file)[1:]), ''.join(split_suffixes(dest_path)[1:]),
+                 str(data_only), str(level))
+        return hashlib.sha256(':'.join(parts).encode()).hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.folder, key[:2], key)
+
+    def fetch(self, key, dest_path):
+        entry = self.entry(key)
+        try:
+            shutil.copyfile(entry, dest_path)
+        except FileNotFoundError:
+            return False
+        os.utime(entry)
+        return True
+
+    def store(self, key, dest_path):
+        # Written under a temporary name and renamed, so parallel workers
+        # never see half an entry.
+        entry = self.entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(entry))
+        os.close(fd)
+        try:
+            shutil.copyfile(dest_path, temp)
+            os.replace(temp, entry)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def files(self):
+        # Only what store writes: <2 hex>/<64 hex> entries and its tmp*
+        # temporaries, flagged True. Anything else in the folder isn't ours.
+        try:
+            folders = os.listdir(self.folder)
+        except FileNotFoundError:
+            return
+        for prefix in folders:
+            folder = os.path.join(self.folder, prefix)
+            if len(prefix) != 2 or not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if CACHE_ENTRY.fullmatch(name) and name[:2] == prefix:
+                    yield os.path.join(folder, name), False
+                elif name.startswith('tmp'):
+                    yield os.path.join(folder, name), True
+
+    def evict(self, max_size):
+        # Stale temporaries always go, live ones are never touched.
+        entries = []
+        total = 0
+        stale = time.time() - TEMP_GRACE
+        for path, temporary in self.files():
+            try:
+                stat = os.stat(path)
+                if temporary:
+                    if stat.st_mtime < stale:
+                        os.unlink(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def convert_file(dest_format, path_file, data_only=False, known_digest=None, compress=None, level=None,
+                 cache_dir=None):
+    # Runs in a worker process. With a known_digest the source is hashed
+    # first and left alone if it hasn't changed since the last run. With
+    # a cache_dir an input converted before is copied from the cache.
+    start = time.perf_counter()
+    digest = None
+    dest_path = output_path(path_file, dest_format, compress)
+    if known_digest is not None or cache_dir is not None:
+        digest = file_digest(path_file)
+        if digest == known_digest and dest_path.exists():
+            return SKIPPED, time.perf_counter() - start, digest
+    if cache_dir is not None:
+        cache = ConversionCache(cache_dir)
+        key = cache.key(digest, path_file, dest_path, data_only, level)
+        if cache.fetch(key, dest_path):
+            return CACHED, time.perf_counter() - start, digest
+    transcode(source_format(path_file), dest_format, path_file, dest_path, data_only, level)
+    if cache_dir is not None:
+        cache.store(key, dest_path)
+    return CONVERTED, time.perf_counter() - start, digest
+
+
+def collect_files(source, dest_format, compress=None):
+    if os.path.isdir(source):
+        paths = (str(path) for path in Path(source).rglob('*'))
+    else:
+        paths = glob.glob(source, recursive=True)
+    formats = Factory.formats()
+    return sorted(path for path in paths
+                  if source_format(path) in formats and output_path(path, dest_format, compress) != Path(path)
+                  and os.path.isfile(path))
+
+
+def is_fresh(path_file, dest_path):
+    dest = Path(dest_path)
+    try:
+        return dest.stat().st_mtime >= os.stat(path_file).st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def load_manifest(manifest):
+    try:
+        with open(manifest) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, hashes):
+    with open(manifest, 'w') as f:
+        json.dump(hashes, f, indent=1, sort_keys=True)
+
+
+def serialize_batch(dest_format, source, data_only=False, jobs=None, skip='mtime', manifest=MANIFEST,
+                    compress=None, level=None, cache_dir=None, cache_size=CACHE_SIZE):
+    # Converts every file matching source (a directory or a glob) across a
+    # process pool and prints one line per file. Returns the counts per
+    # status.
+    # Imported here so a single-file run doesn't pay for multiprocessing.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    start = time.perf_counter()
+    counts = {CONVERTED: 0, CACHED: 0, SKIPPED: 0, FAILED: 0}
+    hashes = load_manifest(manifest) if skip == 'hash' else {}
+
+    def report(status, seconds, path_file, error=''):
+        counts[status] += 1
+        print(f"{status:9} {seconds:8.3f}s  {path_file}{error}")
+
+    # a.json and a.toml both map to a.yaml: the first source in sorted order
+    # is converted and the others fail instead of racing for the output.
+    outputs = {}
+    for path_file in collect_files(source, dest_format, compress):
+        outputs.setdefault(output_path(path_file, dest_format, compress), []).append(path_file)
+
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = {}
+        for dest_path, (path_file, *others) in outputs.items():
+            for other in others:
+                report(FAILED, 0.0, other, f": output collides with {path_file}")
+            key = f"{os.path.abspath(path_file)}:{os.path.abspath(dest_path)}"
+            if skip == 'mtime' and is_fresh(path_file, dest_path):
+                report(SKIPPED, 0.0, path_file)
+                continue
+            known = hashes.get(key, '') if skip == 'hash' else None
+            future = executor.submit(convert_file, dest_format, path_file, data_only, known, compress, level,
+                                     cache_dir)
+            futures[future] = path_file, key
+        for future in as_completed(futures):
+            path_file, key = futures[future]
+            try:
+                status, seconds, digest = future.result()
+            except Exception as error:
+                hashes.pop(key, None)
+                report(FAILED, 0.0, path_file, f": {type(error).__name__}: {error}")
+                continue
+            if digest is not None:
+                hashes[key] = digest
+            report(status, seconds, path_file)
+
+    if skip == 'hash':
+        save_manifest(manifest, hashes)
+    if cache_dir is not None:
+        ConversionCache(cache_dir).evict(cache_size)
+    print(f"{counts[CONVERTED]} converted, {counts[CACHED]} cached, {counts[SKIPPED]} skipped, "
+          f"{counts[FAILED]} failed "
+          f"in {time.perf_counter() - start:.3f}s")
+    return counts
+
+
+def compress_suffix(name):
+    if name is None:
+        return None
+    return '' if name == 'none' else '.' + name.lstrip('.')
 
 
 def main():
@@ -23,20 +289,50 @@ def main():
     parser.add_argument("-c", "--config", dest="config_file", help="Path for the configuration file")
     parser.add_argument("-p", "--path", dest="path_file", help="Path for the input file")
     parser.add_argument("-f", "--format", dest="dest_format", help="New file format")
+    parser.add_argument("-d", "--data-only", dest="data_only", action="store_true",
+                        help="Skip object packing, the file holds plain data only")
+    parser.add_argument("-b", "--batch", dest="batch", help="Directory or glob of files to convert")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, help="Worker processes for --batch")
+    parser.add_argument("-s", "--skip", dest="skip", choices=("mtime", "hash", "none"), default="mtime",
+                        help="How --batch decides a file is up to date")
+    parser.add_argument("-m", "--manifest", dest="manifest", default=MANIFEST,
+                        help="Where --skip hash keeps the source hashes")
+    parser.add_argument("-z", "--compress", dest="compress", choices=("gz", "bz2", "xz", "none"),
+                        help="Compression of the output, the input's by default")
+    parser.add_argument("-l", "--level", dest="level", type=int, help="Compression level (preset for xz)")
+    parser.add_argument("--cache-dir", dest="cache_dir", default=CACHE_DIR, help="Where converted outputs are cached")
+    parser.add_argument("--cache-size", dest="cache_size", type=int, default=CACHE_SIZE >> 20,
+                        help="Cache size limit in MB")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true", help="Always convert, bypass the cache")
     args = parser.parse_args()
+    compress = compress_suffix(args.compress)
+    cache_dir = None if args.no_cache else args.cache_dir
+    cache_size = args.cache_size << 20
 
     if args.config_file is not None:
         config = configparser.ConfigParser()
         try:
             config.read(args.config_file)
-            serialize(config["settings"]["dest_format"], config["settings"]["path_file"])
+            settings = config["settings"]
+            serialize(settings["dest_format"], settings["path_file"],
+                      args.data_only or settings.getboolean("data_only", fallback=False),
+                      compress if args.compress else compress_suffix(settings.get("compress")),
+                      args.level if args.level is not None else settings.getint("level", fallback=None),
+                      cache_dir, cache_size)
         except KeyError:
             print("invalid file")
+    elif args.batch and args.dest_format:
+        counts = serialize_batch('.'+args.dest_format, args.batch, args.data_only, args.jobs, args.skip,
+                                 args.manifest, compress, args.level, cache_dir, cache_size)
+        if counts[FAILED]:
+            raise SystemExit(1)
     else:
         if args.dest_format and args.path_file:
-            serialize('.'+args.dest_format, args.path_file)
+            serialize('.'+args.dest_format, args.path_file, args.data_only, compress, args.level, cache_dir,
+                      cache_size)
         else:
             raise TypeError("invalid parameters")
 
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
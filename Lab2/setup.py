@@ -7,6 +7,6 @@ setup(
     author_email = "hv.karpenko@gmail.com",
     packages = ["additional", "factory", "my_json_serializer", 
         "pickle_serializer", "my_yaml_serializer",
-        "my_toml_serializer"],
+        "my_toml_serializer", "my_binary_serializer"],
     scripts = ["serializer.py"]
 )
\ No newline at end of file
@@ -1,3 +1,5 @@
+from collections import namedtuple
+
 simple_lambda = lambda q: q*q
 int_glob = 73
 str_glob = 'global'
@@ -32,3 +34,21 @@ def cmplx_func(a):
 def simple_func(a):
     return a+10
 
+def recursive_func(n):
+    return 1 if n <= 1 else n * recursive_func(n - 1)
+
+class LinkedNode:
+    def __init__(self, value):
+        self.value = value
+        self.next = self
+
+class SlottedClass:
+    __slots__ = ('x', 'y')
+    def __init__(self):
+        self.x = 1
+        self.y = 'slot'
+
+Point = namedtuple('Point', 'x y')
+
+class Registry(dict):
+    pass
@@ -1,5 +1,13 @@
+import io
+import os
+import sys
+import tempfile
 import unittest
-from factory.factory import Factory
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from factory.factory import Factory, register, registry
+from serializer import serialize_batch, transcode, ConversionCache, MANIFEST
+from additional.additional import convert, deconvert
 import test_source
 
 
@@ -97,6 +105,146 @@ class SerializeTester(unittest.TestCase):
         self.assertEqual(old_obj.const, new_obj.const)
         self.assertEqual(old_obj.simple_class.say_kuku(), new_obj.simple_class.say_kuku(new_obj.simple_class))
 
+    def test_json_signed_numbers(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = [-7, 2.5e-08, -0.75, 10**20, '']
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_json_nested_collections(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = {'a': [(1, 'x, y'), {'b': {2.5}}], 'c': {}, 'd': ()}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_json_load_many_chunks(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = [dict(test_source.dict_1, id=i) for i in range(5000)]
+        self.s.dump(old_obj, 'test.json')
+        new_obj = self.s.load('test.json')
+        self.assertEqual(old_obj, new_obj)
+
+    def test_json_load_long_string(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = {'text': 'a, b' * 100000, 'list': ['x' * 70000, 'y']}
+        self.s.dump(old_obj, 'test.json')
+        self.assertEqual(self.s.load('test.json'), old_obj)
+
+    def test_json_load_file_handle(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = [test_source.dict_1, test_source.list_1]
+        self.assertEqual(self.s.load(io.StringIO(self.s.dumps(old_obj))), old_obj)
+        self.assertEqual(list(self.s.iterload(io.StringIO(self.s.dumps(old_obj)))), old_obj)
+        self.s.dump(old_obj, 'test.json')
+        with open('test.json') as f:
+            self.assertEqual(self.s.load(f), old_obj)
+
+    def test_json_iterload(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = [test_source.list_1, test_source.dict_1, test_source.int_glob] * 2000
+        self.s.dump(old_obj, 'test.json')
+        new_obj = self.s.iterload('test.json')
+        self.assertEqual(next(new_obj), test_source.list_1)
+        self.assertEqual(list(new_obj), old_obj[1:])
+
+    def test_json_dump_flush_threshold(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = test_source.ComplexClass()
+        self.s.dump(old_obj, 'test.json', flush_threshold=16)
+        with open('test.json') as f:
+            self.assertEqual(f.read(), self.s.dumps(old_obj))
+
+    def test_json_recursive_func(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = test_source.recursive_func
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj(6), new_obj(6))
+
+    def test_json_self_reference(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = test_source.LinkedNode(3)
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertIs(new_obj.next, new_obj)
+        self.assertEqual(old_obj.value, new_obj.value)
+
+    def test_json_shared_reference(self):
+        self.s = Factory.create_serializer('.json')
+        shared = test_source.SimpleClass()
+        new_obj = self.s.loads(self.s.dumps([shared, shared]))
+        self.assertIs(new_obj[0], new_obj[1])
+        self.assertEqual(shared.word, new_obj[1].word)
+
+    def test_json_slots_obj(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = test_source.SlottedClass()
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj.x, new_obj.x)
+        self.assertEqual(old_obj.y, new_obj.y)
+
+    def test_json_class_mutation(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = test_source.SimpleClass()
+        self.s.dumps(old_obj)
+        test_source.SimpleClass.added = 'new'
+        try:
+            new_obj = self.s.loads(self.s.dumps(old_obj))
+        finally:
+            del test_source.SimpleClass.added
+        self.assertEqual(new_obj.added, 'new')
+
+    def test_json_repeated_funcs(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = {'a': test_source.simple_func, 'b': test_source.cmplx_func}
+        first = self.s.loads(self.s.dumps(old_obj))
+        second = self.s.loads(self.s.dumps(old_obj))
+        self.assertIs(first['a'].__code__, second['a'].__code__)
+        self.assertEqual(old_obj['b'](2), second['b'](2))
+
+    def test_json_load_mapped(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = {'user': dict(test_source.dict_1, Name='Пётр'), 'func': test_source.simple_func, 'list': test_source.list_1}
+        self.s.dump(old_obj, 'test.json')
+        new_obj = self.s.load('test.json', mapped=True)
+        self.assertEqual(new_obj['user'], old_obj['user'])
+        self.assertEqual(new_obj['list'], old_obj['list'])
+        self.assertEqual(new_obj['func'](2), test_source.simple_func(2))
+        open('test.json', 'w').close()
+        self.assertIsNone(self.s.load('test.json', mapped=True))
+
+    def test_json_dumps_parallel(self):
+        self.s = Factory.create_serializer('.json')
+        for old_obj in ([dict(test_source.dict_1, id=i) for i in range(2000)],
+                        {f'key{i}': [i, test_source.str_glob] for i in range(2000)}, set(range(2000))):
+            self.assertEqual(self.s.dumps(old_obj, workers=2), self.s.dumps(old_obj))
+        old_obj = [test_source.SimpleClass() for _ in range(2000)]
+        new_obj = self.s.loads(self.s.dumps(old_obj, workers=2))
+        self.assertEqual([obj.word for obj in new_obj], [obj.word for obj in old_obj])
+
+    def test_json_dumps_parallel_ids(self):
+        self.s = Factory.create_serializer('.json')
+        shared = test_source.SimpleClass()
+        old_obj = [shared] * 2000
+        text = self.s.dumps(old_obj, workers=2)
+        packed = Factory.create_serializer('.json', data_only=True).loads(text)
+        ids = [item['__id__'] for item in packed if item['__type__'] == 'object']
+        self.assertGreater(len(ids), 1)
+        self.assertEqual(len(ids), len(set(ids)))
+        new_obj = self.s.loads(text)
+        self.assertIs(new_obj[0], new_obj[1])
+        self.assertEqual(new_obj[-1].word, shared.word)
+
+    def test_json_marker_values(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = {'kind': 'object', 'inner': {'name': 'function', 'base': 'class'}}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_json_subclassed_collections(self):
+        self.s = Factory.create_serializer('.json')
+        old_obj = {'point': test_source.Point(3, -4), 'registry': test_source.Registry(a=1)}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(new_obj, {'point': (3, -4), 'registry': {'a': 1}})
+
 #---------YAML---------
     def test_yaml_int(self):
         self.s = Factory.create_serializer('.yaml')
@@ -186,7 +334,76 @@ class SerializeTester(unittest.TestCase):
         self.assertEqual(old_obj.func_with_glob(), new_obj.func_with_glob(new_obj))
         self.assertEqual(old_obj.const, new_obj.const)
         self.assertEqual(old_obj.simple_class.say_kuku(), new_obj.simple_class.say_kuku(new_obj.simple_class))
-    
+
+    def test_yaml_nested_collections(self):
+        self.s = Factory.create_serializer('.yaml')
+        old_obj = {'a': [(1, [2.5, []]), {'b': {'c': -3}, 'd': [True]}, {}], 'e': ({'f': None},)}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_yaml_string_values(self):
+        self.s = Factory.create_serializer('.yaml')
+        old_obj = {'a': '5', 'b': "it's", 'c': 'x: y', 'd': '- z', 'e': '', 'f': 'null', 'g': ['{}', "''"]}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_yaml_shared_reference(self):
+        self.s = Factory.create_serializer('.yaml')
+        shared = test_source.SimpleClass()
+        new_obj = self.s.loads(self.s.dumps([shared, shared]))
+        self.assertIs(new_obj[0], new_obj[1])
+        self.assertEqual(shared.word, new_obj[1].word)
+
+    def test_yaml_load_mapped(self):
+        self.s = Factory.create_serializer('.yaml')
+        old_obj = {'user': dict(test_source.dict_1, Name='Пётр'), 'func': test_source.simple_func, 'list': test_source.list_1}
+        self.s.dump(old_obj, 'test.yaml')
+        new_obj = self.s.load('test.yaml', mapped=True)
+        self.assertEqual(new_obj['user'], old_obj['user'])
+        self.assertEqual(new_obj['list'], old_obj['list'])
+        self.assertEqual(new_obj['func'](2), test_source.simple_func(2))
+        open('test.yaml', 'w').close()
+        self.assertIsNone(self.s.load('test.yaml', mapped=True))
+
+    def test_yaml_dumps_parallel(self):
+        self.s = Factory.create_serializer('.yaml')
+        for old_obj in ([dict(test_source.dict_1, id=i) for i in range(2000)],
+                        {f'key{i}': [i, test_source.str_glob] for i in range(2000)}, set(range(2000))):
+            self.assertEqual(self.s.dumps(old_obj, workers=2), self.s.dumps(old_obj))
+        old_obj = [test_source.SimpleClass() for _ in range(2000)]
+        new_obj = self.s.loads(self.s.dumps(old_obj, workers=2))
+        self.assertEqual([obj.word for obj in new_obj], [obj.word for obj in old_obj])
+
+    def test_yaml_dump_all(self):
+        self.s = Factory.create_serializer('.yaml')
+        old_obj = [dict(test_source.dict_1, id=i) for i in range(200)] + [test_source.str_glob, None]
+        self.s.dump_all(iter(old_obj), 'test.yaml')
+        self.assertEqual(list(self.s.iterload('test.yaml')), old_obj)
+
+    def test_yaml_load_file_handle(self):
+        self.s = Factory.create_serializer('.yaml')
+        old_obj = test_source.SimpleClass()
+        new_obj = self.s.load(io.StringIO(self.s.dumps(old_obj)))
+        self.assertEqual(new_obj.word, old_obj.word)
+        self.s.dump(test_source.dict_1, 'test.yaml')
+        with open('test.yaml') as f:
+            self.assertEqual(self.s.load(f), test_source.dict_1)
+
+    def test_yaml_dump_file(self):
+        self.s = Factory.create_serializer('.yaml')
+        for old_obj in (test_source.ComplexClass(), test_source.str_glob, {}, [[{}], {'a': (1, {'b': []})}]):
+            self.s.dump(old_obj, 'test.yaml')
+            with open('test.yaml') as f:
+                self.assertEqual(f.read(), self.s.dumps(old_obj))
+
+    def test_yaml_iterload_objects(self):
+        self.s = Factory.create_serializer('.yaml')
+        self.s.dump_all([test_source.SimpleClass(), test_source.simple_func], 'test.yaml')
+        with open('test.yaml') as f:
+            obj, func = self.s.iterload(f)
+        self.assertEqual(obj.word, test_source.SimpleClass().word)
+        self.assertEqual(func(4), test_source.simple_func(4))
+
 #---------TOML---------
     def test_toml_int(self):
         self.s = Factory.create_serializer('.toml')
@@ -277,6 +494,52 @@ class SerializeTester(unittest.TestCase):
         self.assertEqual(old_obj.const, new_obj.const)
         self.assertEqual(old_obj.simple_class.say_kuku(), new_obj.simple_class.say_kuku(new_obj.simple_class))
 
+    def test_toml_many_sections(self):
+        self.s = Factory.create_serializer('.toml')
+        old_obj = {f'section{i}': {'name': 'host', 'port': i, 'tags': ['a', 'b']} for i in range(500)}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_toml_nested_tables(self):
+        self.s = Factory.create_serializer('.toml')
+        old_obj = {'a': {}, 'b': {'c': {'d': {}}, 'e': [(1, 'x, y'), [2.5]]}, 'f': -3, 'g': 1e-08}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_toml_load_mapped(self):
+        self.s = Factory.create_serializer('.toml')
+        old_obj = {'user': dict(test_source.dict_1, Name='Пётр'), 'func': test_source.simple_func, 'list': test_source.list_1}
+        self.s.dump(old_obj, 'test.toml')
+        new_obj = self.s.load('test.toml', mapped=True)
+        self.assertEqual(new_obj['user'], old_obj['user'])
+        self.assertEqual(new_obj['list'], old_obj['list'])
+        self.assertEqual(new_obj['func'](2), test_source.simple_func(2))
+        open('test.toml', 'w').close()
+        self.assertIsNone(self.s.load('test.toml', mapped=True))
+
+    def test_toml_load_file_handle(self):
+        self.s = Factory.create_serializer('.toml')
+        old_obj = test_source.ComplexClass()
+        self.s.dump(old_obj, 'test.toml')
+        with open('test.toml') as f:
+            new_obj = self.s.load(f)
+        self.assertEqual(old_obj.simple_class.word, new_obj.simple_class.word)
+        self.assertEqual(old_obj.func_with_glob(), new_obj.func_with_glob(new_obj))
+
+    def test_load_mapped_file_handle(self):
+        for format in ('.json', '.toml', '.yaml'):
+            self.s = Factory.create_serializer(format)
+            self.s.dump(test_source.dict_1, 'test' + format)
+            with open('test' + format) as f:
+                self.assertEqual(self.s.load(f, mapped=True), test_source.dict_1)
+
+    def test_toml_dump_file(self):
+        self.s = Factory.create_serializer('.toml')
+        old_obj = test_source.ComplexClass()
+        self.s.dump(old_obj, 'test.toml')
+        with open('test.toml') as f:
+            self.assertEqual(f.read(), self.s.dumps(old_obj))
+
 #---------PICKLE---------
     def test_pickle_int(self):
         self.s = Factory.create_serializer('.pickle')
@@ -360,5 +623,395 @@ class SerializeTester(unittest.TestCase):
         self.assertEqual(old_obj.const, new_obj.const)
         self.assertEqual(old_obj.simple_class.say_kuku(), new_obj.simple_class.say_kuku(new_obj.simple_class))
 
+    def test_pickle_recursive_func(self):
+        self.s = Factory.create_serializer('.pickle')
+        old_obj = test_source.recursive_func
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj(6), new_obj(6))
+
+    def test_pickle_self_reference(self):
+        self.s = Factory.create_serializer('.pickle')
+        old_obj = test_source.LinkedNode(3)
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertIs(new_obj.next, new_obj)
+        self.assertEqual(old_obj.value, new_obj.value)
+
+    def test_pickle_shared_reference(self):
+        self.s = Factory.create_serializer('.pickle')
+        shared = test_source.SimpleClass()
+        new_obj = self.s.loads(self.s.dumps([shared, shared]))
+        self.assertIs(new_obj[0], new_obj[1])
+        self.assertEqual(shared.word, new_obj[1].word)
+
+    def test_pickle_bytes(self):
+        self.s = Factory.create_serializer('.pickle')
+        old_obj = {'small': b'\x00\xff', 'mutable': bytearray(b'abc'), 'large': bytes(range(256)) * 512}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+        self.assertIs(type(new_obj['mutable']), bytearray)
+
+    def test_pickle_out_of_band(self):
+        self.s = Factory.create_serializer('.pickle')
+        payload = bytearray(range(256)) * 512
+        buffers = []
+        data = self.s.dumps({'payload': payload, 'word': 'test'}, buffer_callback=buffers.append)
+        self.assertLess(len(data), len(payload))
+        self.assertEqual(len(buffers), 1)
+        new_obj = self.s.loads(data, buffers=buffers)
+        self.assertEqual(bytes(new_obj['payload']), payload)
+        self.assertEqual(new_obj['word'], 'test')
+
+    def test_pickle_data_only_out_of_band(self):
+        import array
+        self.s = Factory.create_serializer('.pickle', data_only=True)
+        old_obj = {'blob': bytearray(1 << 20), 'small': b'ab', 'numbers': array.array('i', range(10)), 'list': [1, 2]}
+        buffers = []
+        data = self.s.dumps(old_obj, buffer_callback=buffers.append)
+        self.assertLess(len(data), 1 << 16)
+        self.assertEqual(len(buffers), 1)
+        new_obj = self.s.loads(data, buffers=buffers)
+        self.assertEqual(bytes(new_obj['blob']), bytes(old_obj['blob']))
+        self.assertEqual(new_obj['numbers'], old_obj['numbers'])
+        self.assertEqual(new_obj['list'], [1, 2])
+        self.assertEqual(new_obj['small'], b'ab')
+
+    def test_pickle_file_handle(self):
+        self.s = Factory.create_serializer('.pickle')
+        old_obj = [test_source.dict_1, b'bytes']
+        with open('test.pickle', 'wb') as f:
+            self.s.dump(old_obj, f)
+        with open('test.pickle', 'rb') as f:
+            self.assertEqual(self.s.load(f), old_obj)
+
+#---------BIN---------
+    def test_bin_int(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.int_glob
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_float(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.float_glob
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_str(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.str_glob
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_boolean(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.boolean_glob
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_none(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.none_glob
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_list(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.list_1
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_tuple(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.tuple_1
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_set(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.set_1
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+        
+    def test_bin_dict(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.dict_1
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_lambda(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.simple_lambda
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj(5), new_obj(5))
+
+    def test_bin_cmplx_func(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.cmplx_func
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj(4), new_obj(4))
+
+    def test_bin_simple_class_obj(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.SimpleClass()
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj.say_kuku(), new_obj.say_kuku(new_obj))
+        self.assertEqual(old_obj.word, new_obj.word)
+
+    def test_bin_cmplx_class_obj(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.ComplexClass()
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj.simple_class.word, new_obj.simple_class.word)
+        self.assertEqual(old_obj.func_with_glob(), new_obj.func_with_glob(new_obj))
+        self.assertEqual(old_obj.const, new_obj.const)
+        self.assertEqual(old_obj.simple_class.say_kuku(), new_obj.simple_class.say_kuku(new_obj.simple_class))
+
+    def test_bin_recursive_func(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.recursive_func
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj(6), new_obj(6))
+
+    def test_bin_self_reference(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.LinkedNode(3)
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertIs(new_obj.next, new_obj)
+        self.assertEqual(old_obj.value, new_obj.value)
+
+    def test_bin_shared_reference(self):
+        self.s = Factory.create_serializer('.bin')
+        shared = test_source.SimpleClass()
+        new_obj = self.s.loads(self.s.dumps([shared, shared]))
+        self.assertIs(new_obj[0], new_obj[1])
+        self.assertEqual(shared.word, new_obj[1].word)
+
+    def test_bin_file(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = test_source.simple_func
+        self.s.dump(old_obj, 'test.bin')
+        new_obj = self.s.load('test.bin')
+        self.assertEqual(old_obj(4), new_obj(4))
+
+    def test_bin_file_handle(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = {'text': 'x' * 200000, 'list': test_source.list_1}
+        self.assertEqual(self.s.load(io.BytesIO(self.s.dumps(old_obj))), old_obj)
+        self.s.dump(old_obj, 'test.bin')
+        with open('test.bin', 'rb') as f:
+            self.assertEqual(self.s.load(f), old_obj)
+
+    def test_bin_file_chunks(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = {'text': 'x' * 200000, 'items': [dict(test_source.dict_1, id=i, ratio=i / 3) for i in range(5000)]}
+        self.s.dump(old_obj, 'test.bin')
+        with open('test.bin', 'rb') as f:
+            self.assertEqual(f.read(), self.s.dumps(old_obj))
+        self.assertEqual(self.s.load('test.bin'), old_obj)
+        with open('test.bin', 'ab') as f:
+            f.write(b'\x00')
+        with self.assertRaises(ValueError):
+            self.s.load('test.bin')
+        with open('test.bin', 'wb') as f:
+            f.write(self.s.dumps(old_obj)[:100000])
+        with self.assertRaises(ValueError):
+            self.s.load('test.bin')
+
+    def test_bin_numbers(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = [0, 63, -64, 64, -65, 2**64, -2**70, 2.5e-08, -0.0, '', 'naïve ✓']
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_nested_collections(self):
+        self.s = Factory.create_serializer('.bin')
+        old_obj = {'a': [(1, 'x, y'), {'b': {2.5}}], 'c': {}, 'd': (), (1, 'k'): None}
+        new_obj = self.s.loads(self.s.dumps(old_obj))
+        self.assertEqual(old_obj, new_obj)
+
+    def test_bin_truncated(self):
+        self.s = Factory.create_serializer('.bin')
+        data = self.s.dumps(test_source.dict_1)
+        with self.assertRaises(ValueError):
+            self.s.loads(data[:-1])
+
+#---------DATA ONLY---------
+    def test_data_only_round_trip(self):
+        old_obj = {'user': test_source.dict_1, 'other': {'user': dict(test_source.dict_1, Age=24)}, 'list': test_source.list_1,
+                   'ratio': 0.5, 'none': None}
+        for format in ('.json', '.yaml', '.toml', '.pickle', '.bin'):
+            self.s = Factory.create_serializer(format, data_only=True)
+            self.assertEqual(self.s.loads(self.s.dumps(old_obj)), old_obj)
+
+    def test_data_only_tagged_dict(self):
+        self.s = Factory.create_serializer('.json', data_only=True)
+        old_obj = {'__type__': 'ref', '__id__': 0}
+        self.assertEqual(self.s.loads(self.s.dumps(old_obj)), old_obj)
+
+    def test_data_only_rejects_objects(self):
+        for format in ('.json', '.yaml', '.toml', '.pickle', '.bin'):
+            self.s = Factory.create_serializer(format, data_only=True)
+            with self.assertRaises(TypeError):
+                self.s.dumps({'func': test_source.simple_func})
+            with self.assertRaises(TypeError):
+                self.s.dumps([test_source.SimpleClass()])
+
+    def test_data_only_circular_reference(self):
+        old_obj = []
+        old_obj.append({'self': old_obj})
+        shared = [1, 2]
+        for format in ('.json', '.yaml', '.toml', '.pickle', '.bin'):
+            self.s = Factory.create_serializer(format, data_only=True)
+            with self.assertRaises(ValueError):
+                self.s.dumps(old_obj)
+            self.assertEqual(self.s.loads(self.s.dumps({'a': shared, 'b': shared})), {'a': shared, 'b': shared})
+
+#---------BATCH---------
+    def test_batch_convert(self):
+        self.s = Factory.create_serializer('.json')
+        with tempfile.TemporaryDirectory() as folder:
+            for i in range(4):
+                self.s.dump(dict(test_source.dict_1, id=i), os.path.join(folder, f'file{i}.json'))
+            with open(os.path.join(folder, 'broken.json'), 'w') as f:
+                f.write('{"Name": ')
+            manifest = os.path.join(folder, MANIFEST)
+            with redirect_stdout(io.StringIO()):
+                first = serialize_batch('.yaml', folder, jobs=2, skip='hash', manifest=manifest)
+                second = serialize_batch('.yaml', folder, jobs=2, skip='hash', manifest=manifest)
+                third = serialize_batch('.yaml', os.path.join(folder, '*.json'), jobs=2)
+            self.assertEqual(first, {'converted': 4, 'cached': 0, 'skipped': 0, 'failed': 1})
+            self.assertEqual(second, {'converted': 0, 'cached': 0, 'skipped': 4, 'failed': 1})
+            self.assertEqual(third, {'converted': 0, 'cached': 0, 'skipped': 4, 'failed': 1})
+            new_obj = Factory.create_serializer('.yaml').load(os.path.join(folder, 'file3.yaml'))
+            self.assertEqual(new_obj, dict(test_source.dict_1, id=3))
+
+    def test_batch_output_collision(self):
+        with tempfile.TemporaryDirectory() as folder:
+            Factory.create_serializer('.json').dump({'source': 'json'}, os.path.join(folder, 'a.json'))
+            Factory.create_serializer('.toml').dump({'source': 'toml'}, os.path.join(folder, 'a.toml'))
+            output = io.StringIO()
+            with redirect_stdout(output):
+                counts = serialize_batch('.yaml', folder, jobs=2, skip='none')
+            self.assertEqual(counts, {'converted': 1, 'cached': 0, 'skipped': 0, 'failed': 1})
+            self.assertIn('output collides with', output.getvalue())
+            new_obj = Factory.create_serializer('.yaml').load(os.path.join(folder, 'a.yaml'))
+            self.assertEqual(new_obj, {'source': 'json'})
+
+    def test_batch_cache(self):
+        self.s = Factory.create_serializer('.json')
+        with tempfile.TemporaryDirectory() as folder, tempfile.TemporaryDirectory() as cache_dir:
+            for i in range(3):
+                self.s.dump(dict(test_source.dict_1, id=i), os.path.join(folder, f'file{i}.json'))
+            self.s.dump(dict(test_source.dict_1, id=0), os.path.join(folder, 'copy.json'))
+            with redirect_stdout(io.StringIO()):
+                first = serialize_batch('.toml', folder, jobs=1, skip='none', cache_dir=cache_dir)
+                second = serialize_batch('.toml', folder, jobs=1, skip='none', cache_dir=cache_dir)
+            self.assertEqual(first['converted'] + first['cached'], 4)
+            self.assertEqual(second, {'converted': 0, 'cached': 4, 'skipped': 0, 'failed': 0})
+            new_obj = Factory.create_serializer('.toml').load(os.path.join(folder, 'copy.toml'))
+            self.assertEqual(new_obj, dict(test_source.dict_1, id=0))
+            own_files = [os.path.join(cache_dir, 'notes.txt'), os.path.join(cache_dir, 'ab', 'notes.txt')]
+            live, stale = os.path.join(cache_dir, 'ab', 'tmplive'), os.path.join(cache_dir, 'ab', 'tmpstale')
+            os.makedirs(os.path.join(cache_dir, 'ab'), exist_ok=True)
+            for path in own_files + [live, stale]:
+                with open(path, 'w') as f:
+                    f.write('keep')
+            os.utime(stale, (0, 0))
+            ConversionCache(cache_dir).evict(0)
+            self.assertEqual(sorted(os.path.join(root, name) for root, _, files in os.walk(cache_dir)
+                                    for name in files), sorted(own_files + [live]))
+
+    def test_transcode(self):
+        old_obj = [test_source.SimpleClass(), test_source.simple_func, test_source.dict_1]
+        with tempfile.TemporaryDirectory() as folder:
+            src, dest = os.path.join(folder, 'src.json'), os.path.join(folder, 'dest.yaml')
+            Factory.create_serializer('.json').dump(old_obj, src)
+            transcode('.json', '.yaml', src, dest)
+            obj, func, data = Factory.create_serializer('.yaml').load(dest)
+        self.assertEqual(obj.word, old_obj[0].word)
+        self.assertEqual(func(3), test_source.simple_func(3))
+        self.assertEqual(data, test_source.dict_1)
+
+#---------FACTORY---------
+    def test_factory_cached_instances(self):
+        self.assertIs(Factory.create_serializer('.json'), Factory.create_serializer('.json'))
+        self.assertIsNot(Factory.create_serializer('.json'), Factory.create_serializer('.json', data_only=True))
+        self.assertIs(Factory.create_serializer('.unknown'), Factory.create_serializer('.yaml'))
+
+    def test_factory_register(self):
+        register('.jsn', 'my_json_serializer.json_serializer:Json')
+        self.addCleanup(registry.pop, '.jsn')
+        self.s = Factory.create_serializer('.jsn')
+        self.assertIn('.jsn', Factory.formats())
+        self.assertEqual(self.s.dumps(test_source.dict_1), Factory.create_serializer('.json').dumps(test_source.dict_1))
+
+    def test_shared_serializer_threads(self):
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        for format in ('.json', '.toml', '.yaml', '.pickle', '.bin'):
+            self.s = Factory.create_serializer(format)
+
+            def round_trip(i):
+                old_obj = {'id': i, 'user': dict(test_source.dict_1, Age=i), 'list': [i] * (i % 7),
+                           'func': test_source.simple_func}
+                new_obj = self.s.loads(self.s.dumps(old_obj))
+                return new_obj['func'](i) == test_source.simple_func(i) and new_obj['user'] == old_obj['user']
+
+            with ThreadPoolExecutor(8) as executor:
+                self.assertTrue(all(executor.map(round_trip, range(200))))
+
+#---------COMPRESSION---------
+    def test_compressed_dump_load(self):
+        old_obj = {'user': test_source.dict_1, 'list': test_source.list_1 * 100, 'func': test_source.simple_func}
+        for format in ('.json', '.toml', '.yaml', '.pickle', '.bin'):
+            self.s = Factory.create_serializer(format)
+            for suffix in ('.gz', '.bz2', '.xz'):
+                with tempfile.TemporaryDirectory() as folder:
+                    path = os.path.join(folder, 'test' + format + suffix)
+                    self.s.dump(old_obj, path, level=1)
+                    with open(path, 'rb') as f:
+                        self.assertNotIn(b'Petr', f.read())
+                    new_obj = self.s.load(path)
+                self.assertEqual(new_obj['list'], old_obj['list'])
+                self.assertEqual(new_obj['func'](5), test_source.simple_func(5))
+
+    def test_compressed_transcode(self):
+        with tempfile.TemporaryDirectory() as folder:
+            src, dest = os.path.join(folder, 'src.json.gz'), os.path.join(folder, 'dest.yaml.xz')
+            Factory.create_serializer('.json').dump(test_source.dict_1, src)
+            transcode('.json', '.yaml', src, dest, level=0)
+            self.assertEqual(Factory.create_serializer('.yaml').load(dest, mapped=True), test_source.dict_1)
+
+#---------CONVERT---------
+    def test_convert_deep_nesting(self):
+        old_obj = node = []
+        for _ in range(10000):
+            child = []
+            node.append({'level': child, 'pair': (1, 'x')})
+            node = child
+        new_obj = deconvert(convert(old_obj))
+        for _ in range(10000):
+            self.assertEqual(new_obj[0]['pair'], (1, 'x'))
+            new_obj = new_obj[0]['level']
+        self.assertEqual(new_obj, [])
+
+    def test_convert_circular_reference(self):
+        old_obj = []
+        old_obj.append({'self': old_obj})
+        with self.assertRaises(ValueError):
+            convert(old_obj)
+        shared = [1, 2]
+        self.assertEqual(deconvert(convert([shared, (shared,)])), [[1, 2], ([1, 2],)])
+
+    def test_convert_tagged_user_dicts(self):
+        data = {'ref': {'__type__': 'ref', '__id__': 3}, 'object': {'__type__': 'object'},
+                'dict': {'__type__': 'dict', '__value__': 1}, 'class': {'__type__': 'class', 'inner': {'__type__': 'function'}}}
+        for format in ('.json', '.yaml', '.toml', '.pickle', '.bin'):
+            self.s = Factory.create_serializer(format)
+            new_obj = self.s.loads(self.s.dumps(dict(data, instance=test_source.SimpleClass())))
+            self.assertEqual(new_obj.pop('instance').word, test_source.SimpleClass().word)
+            self.assertEqual(new_obj, data)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file